@@ -0,0 +1,96 @@
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+# Setup đường dẫn để import được các module cùng thư mục src
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from petrinet import PetriNet
+from generate_hard_test import build_parallel_net, generate_parallel_pnml
+from net_formats import read_lola, read_tina, write_lola, write_tina
+
+def _best_time(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_formats(num_processes=20000, repeat=3):
+    """
+    So sánh tốc độ đọc cùng một net ở 3 định dạng: PNML, LoLA và Tina (.net).
+    In ra kích thước file, thời gian đọc (lấy lần nhanh nhất) và số arc/giây.
+    """
+    print(f"\n>>> BENCHMARK ĐỌC FILE: PNML vs LoLA vs Tina ({num_processes} luồng) <<<")
+    with tempfile.TemporaryDirectory() as tmp:
+        pnml_path = os.path.join(tmp, "bench.pnml")
+        lola_path = os.path.join(tmp, "bench.lola")
+        tina_path = os.path.join(tmp, "bench.net")
+        with redirect_stdout(io.StringIO()):
+            generate_parallel_pnml(num_processes=num_processes, make_deadlock=True, filename=pnml_path)
+        net = PetriNet()
+        net._parse_pnml(pnml_path)
+        write_lola(net, lola_path)
+        write_tina(net, tina_path)
+        num_arcs = len(net.arcs)
+
+        readers = [
+            ("PNML", pnml_path, lambda: PetriNet()._parse_pnml(pnml_path)),
+            ("LoLA", lola_path, lambda: read_lola(PetriNet(), lola_path)),
+            ("Tina", tina_path, lambda: read_tina(PetriNet(), tina_path)),
+        ]
+        results = {}
+        for label, path, fn in readers:
+            elapsed = _best_time(fn, repeat)
+            results[label] = elapsed
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            print(f"--> {label}: {size_mb:8.2f} MB | {elapsed:.4f} s | {num_arcs / elapsed:,.0f} arcs/s")
+
+    for label in ("LoLA", "Tina"):
+        print(f"--> {label} nhanh gấp {results['PNML'] / results[label]:.2f} lần PNML")
+    return results
+
+def bench_codegen(num_processes=12, repeat=3):
+    """
+    So sánh BFS diễn giải (run_reachability_bfs) với BFS dùng hàm successors sinh riêng cho net
+    (run_reachability_bfs(codegen=True)) trên mạng N luồng. Lần chạy codegen đầu tiên gồm cả
+    thời gian sinh/compile code, các lần sau lấy hàm từ cache.
+    """
+    print(f"\n>>> BENCHMARK BFS: diễn giải vs codegen ({num_processes} luồng) <<<")
+    net = build_parallel_net(num_processes=num_processes, make_deadlock=True)
+    results = {}
+    for label, codegen in (("Diễn giải", False), ("Codegen", True)):
+        with redirect_stdout(io.StringIO()):
+            elapsed = _best_time(lambda: net.run_reachability_bfs(codegen=codegen), repeat)
+            states = net.run_reachability_bfs(codegen=codegen)
+        results[label] = elapsed
+        print(f"--> {label}: {states} trạng thái | {elapsed:.4f} s | {states / elapsed:,.0f} trạng thái/s")
+    print(f"--> Codegen nhanh gấp {results['Diễn giải'] / results['Codegen']:.2f} lần")
+    return results
+
+def bench_frontier(num_processes=12, repeat=3):
+    """
+    So sánh BFS từng marking (run_reachability_bfs) với BFS theo frontier vector hóa bằng NumPy
+    (run_reachability_frontier) trên mạng N luồng.
+    """
+    print(f"\n>>> BENCHMARK BFS: từng marking vs frontier NumPy ({num_processes} luồng) <<<")
+    net = build_parallel_net(num_processes=num_processes, make_deadlock=True)
+    results = {}
+    for label, run in (("Từng marking", net.run_reachability_bfs), ("Frontier", net.run_reachability_frontier)):
+        with redirect_stdout(io.StringIO()):
+            elapsed = _best_time(run, repeat)
+            states = run()
+        results[label] = elapsed
+        print(f"--> {label}: {states} trạng thái | {elapsed:.4f} s | {states / elapsed:,.0f} trạng thái/s")
+    print(f"--> Frontier nhanh gấp {results['Từng marking'] / results['Frontier']:.2f} lần")
+    return results
+
+if __name__ == "__main__":
+    bench_formats()
+    bench_codegen()
+    bench_frontier()
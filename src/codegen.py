@@ -0,0 +1,75 @@
+import hashlib
+from array import array
+
+# Sinh mã Python chuyên biệt cho từng net (dùng cho run_reachability_bfs(codegen=True)).
+# Thay vì vòng lặp diễn giải pre/delta của từng transition ở mỗi lần bắn, mỗi transition
+# thành một đoạn code thẳng với chỉ số và trọng số là hằng số:
+#
+#     def successors(data):
+#         m = data
+#         out = []
+#         if m[3] >= 1 and m[7] >= 1:        # t_k enable?
+#             n = bytearray(data)
+#             n[3] -= 1
+#             n[9] += 1
+#             out.append(bytes(n))
+#         ...
+#         return out
+#
+# data là bytes số token của marking (array theo typecode, xem petrinet.MarkingSet). Hàm sinh ra
+# được cache theo fingerprint của net, nên các net giống hệt nhau (kể cả đọc lại từ file) chỉ
+# sinh/compile một lần.
+
+_FUNCTION_CACHE = {}   # fingerprint -> hàm successors đã compile
+
+def net_fingerprint(net, typecode="B"):
+    """Fingerprint của CompiledNet theo đúng chỉ số place/transition (khác chỉ số -> khác code)."""
+    payload = repr((typecode, net.num_places, net.pre, net.delta))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def generate_source(net, typecode="B"):
+    """Mã nguồn của hàm successors(data) -> list bytes các marking kế tiếp, theo thứ tự transition."""
+    # Typecode 'B': phần tử của bytes chính là số token, bắn trên bytearray (nhanh hơn array)
+    byte_sized = typecode == "B"
+    lines = ["def successors(data):"]
+    lines.append("    m = data" if byte_sized else f"    m = array({typecode!r}, data)")
+    lines.append("    out = []")
+    lines.append("    append = out.append")
+    if net.num_transitions == 0:
+        # Net không có transition: không marking nào có successor (khối try rỗng là lỗi cú pháp)
+        lines.append("    return out")
+        return "\n".join(lines) + "\n"
+    lines.append("    try:")
+    for k in range(net.num_transitions):
+        lines.append(f"        # {net.transition_ids[k]!r}")
+        condition = " and ".join(f"m[{i}] >= {w}" for i, w in net.pre[k]) or "True"
+        lines.append(f"        if {condition}:")
+        if not net.delta[k]:
+            lines.append("            append(data)")
+            continue
+        lines.append("            n = bytearray(data)" if byte_sized else f"            n = array({typecode!r}, data)")
+        for i, d in net.delta[k]:
+            lines.append(f"            n[{i}] {'+' if d > 0 else '-'}= {abs(d)}")
+        lines.append("            append(bytes(n))" if byte_sized else "            append(n.tobytes())")
+    lines.append("    except ValueError:")
+    lines.append("        # bytearray báo vượt 255 bằng ValueError; đổi về OverflowError như array")
+    lines.append("        raise OverflowError('số token vượt kiểu lưu marking')")
+    lines.append("    return out")
+    return "\n".join(lines) + "\n"
+
+def successor_function(net, typecode="B"):
+    """
+    Hàm successors đã compile cho CompiledNet net (lấy từ cache nếu đã có).
+    Hàm ném OverflowError nếu số token vượt typecode, giống engine diễn giải.
+    """
+    key = net_fingerprint(net, typecode)
+    function = _FUNCTION_CACHE.get(key)
+    if function is None:
+        namespace = {"array": array}
+        code = compile(generate_source(net, typecode), f"<petrinet codegen {key[:12]}>", "exec")
+        exec(code, namespace)
+        function = _FUNCTION_CACHE[key] = namespace["successors"]
+    return function
+
+def clear_cache():
+    _FUNCTION_CACHE.clear()
@@ -0,0 +1,109 @@
+import heapq
+import os
+import sys
+
+# Tập marking lưu trên đĩa cho BFS ngoài bộ nhớ (run_reachability_external).
+# Mỗi marking là một bản ghi bytes độ dài cố định; một "file đã sort" là các bản ghi nối liền,
+# tăng dần theo thứ tự bytes và không trùng nhau. Mọi phép toán tập hợp (hợp, hiệu, khử trùng)
+# đều là merge tuần tự trên các file đó, không cần tra cứu ngẫu nhiên nên bộ nhớ chỉ tốn cho bộ đệm.
+
+MAX_FAN_IN = 64   # số file mở đồng thời tối đa khi merge
+
+def read_records(path, record_size, chunk_records=1 << 14):
+    """Duyệt tuần tự các bản ghi record_size byte của file, đọc từng khối chunk_records bản ghi."""
+    chunk_bytes = record_size * max(1, chunk_records)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_bytes)
+            if not chunk:
+                return
+            for start in range(0, len(chunk), record_size):
+                yield chunk[start:start + record_size]
+
+def write_records(path, records, buffer_bytes=1 << 20):
+    """
+    Ghi các bản ghi (đã sort) ra file, trả về số bản ghi đã ghi. Bộ đệm ghi của file
+    giới hạn ở buffer_bytes byte (không gom thêm một bản nối chuỗi lớn nào).
+    """
+    count = 0
+    with open(path, "wb", buffering=max(1, buffer_bytes)) as f:
+        write = f.write
+        for record in records:
+            write(record)
+            count += 1
+    return count
+
+def unique_sorted(records):
+    """Bỏ các bản ghi trùng liên tiếp trong một dãy đã sort."""
+    previous = None
+    for record in records:
+        if record != previous:
+            yield record
+            previous = record
+
+def difference_sorted(records, removed):
+    """Các bản ghi của dãy records (đã sort, không trùng) không có trong dãy removed (đã sort)."""
+    removed = iter(removed)
+    current = next(removed, None)
+    for record in records:
+        while current is not None and current < record:
+            current = next(removed, None)
+        if record != current:
+            yield record
+
+class RunSpiller:
+    """
+    Gom bản ghi trong một bộ đệm giới hạn theo memory_budget (byte). Khi đầy, bộ đệm được sort,
+    khử trùng và ghi ra một file run mới trong thư mục dir_path.
+    """
+    def __init__(self, dir_path, prefix, record_size, memory_budget, buffer_bytes=1 << 20):
+        self.dir_path = dir_path
+        self.prefix = prefix
+        self.buffer_bytes = buffer_bytes   # bộ đệm ghi file run (xem write_records)
+        # Chi phí ước lượng của một bản ghi trong set: object bytes + một ô của bảng băm
+        per_record = sys.getsizeof(bytes(record_size)) + 40
+        self.capacity = max(1, memory_budget // per_record)
+        self.buffer = set()
+        self.runs = []
+
+    def add(self, record):
+        self.buffer.add(record)
+        if len(self.buffer) >= self.capacity:
+            self.spill()
+
+    def spill(self):
+        if not self.buffer:
+            return
+        path = os.path.join(self.dir_path, f"{self.prefix}_{len(self.runs)}.run")
+        write_records(path, sorted(self.buffer), self.buffer_bytes)
+        self.runs.append(path)
+        self.buffer.clear()
+
+    def finish(self):
+        # Ghi nốt bộ đệm, trả về danh sách file run (mỗi file đã sort, không trùng)
+        self.spill()
+        return self.runs
+
+def reduce_runs(paths, record_size, chunk_records=1 << 14):
+    """
+    Merge trước theo từng nhóm MAX_FAN_IN file cho tới khi còn không quá MAX_FAN_IN file run
+    (file đầu vào đã merge bị xóa). Trả về danh sách file run còn lại.
+    """
+    paths = list(paths)
+    passes = 0
+    while len(paths) > MAX_FAN_IN:
+        merged = []
+        for start in range(0, len(paths), MAX_FAN_IN):
+            group = paths[start:start + MAX_FAN_IN]
+            path = f"{group[0]}.pass{passes}"
+            write_records(path, merge_sorted(group, record_size, chunk_records), record_size * chunk_records)
+            for p in group:
+                os.remove(p)
+            merged.append(path)
+        paths = merged
+        passes += 1
+    return paths
+
+def merge_sorted(paths, record_size, chunk_records=1 << 14):
+    """Dãy đã sort, không trùng gồm mọi bản ghi của các file (mỗi file đã sort)."""
+    return unique_sorted(heapq.merge(*(read_records(p, record_size, chunk_records) for p in paths)))
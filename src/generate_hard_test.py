@@ -1,4 +1,38 @@
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from petrinet import PetriNet
+
+def build_parallel_net(num_processes=10, make_deadlock=True):
+    """
+    Dựng trực tiếp trong bộ nhớ cùng mạng N luồng như generate_parallel_pnml (cùng id, tên,
+    marking và arc), qua API hàng loạt add_places/add_transitions/add_arcs, không qua XML.
+    Ghi ra file nếu cần bằng net_formats.write_pnml.
+    """
+    ids = range(num_processes)
+    place_ids, markings, names = [], [], []
+    kinds = [("p_ready", "Ready", 1), ("p_work", "Work", 0)]
+    if make_deadlock:
+        kinds.append(("p_dead", "DeadEnd", 0))
+    for prefix, label, tokens in kinds:
+        place_ids += [f"{prefix}_{i}" for i in ids]
+        names += [f"{label}_{i}" for i in ids]
+        markings += [tokens] * num_processes
+
+    # Ready -> Start -> Work -> Finish -> (DeadEnd nếu có deadlock, ngược lại quay về Ready)
+    back = "p_dead" if make_deadlock else "p_ready"
+    sources, targets = [], []
+    for source, target in (("p_ready", "t_start"), ("t_start", "p_work"), ("p_work", "t_finish"), ("t_finish", back)):
+        sources += [f"{source}_{i}" for i in ids]
+        targets += [f"{target}_{i}" for i in ids]
+
+    net = PetriNet()
+    net.add_places(place_ids, markings, names)
+    net.add_transitions([f"t_start_{i}" for i in ids] + [f"t_finish_{i}" for i in ids])
+    net.add_arcs(sources, targets)
+    return net
 
 def generate_parallel_pnml(num_processes=10, make_deadlock=True, filename="data/hard_deadlock.pnml"):
     """
@@ -31,7 +31,7 @@ def main():
     
     if os.path.exists(file_path):
         print("-> FILE FOUND! Starting to parse...")
-        if net.load_pnml(file_path):
+        if net.load_pnml(file_path, use_cache=True):
             #net.export_graphviz()
              # GỌI TASK 2 Ở ĐÂY
             print("\n>>>EXPLICIT REACHABILITY (BFS) <<<")
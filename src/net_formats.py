@@ -0,0 +1,253 @@
+import gzip
+import lzma
+import re
+from xml.sax.saxutils import escape, quoteattr
+
+# Đọc/ghi các định dạng net dạng text gọn (nhỏ hơn PNML nhiều lần, tokenize nhanh hơn):
+#   - LoLA (.lola):  PLACE ...; MARKING ...; TRANSITION t CONSUME ...; PRODUCE ...;
+#   - Tina (.net):   pl p (k) / tr t p1 p2*2 -> p3
+# và ghi PNML (write_pnml) cho net dựng trực tiếp trong bộ nhớ bằng add_places/add_transitions/add_arcs.
+# Các hàm read_* điền vào đúng các cấu trúc places/transitions/pre_set/post_set của PetriNet
+# thông qua add_place/add_transition/add_arc, nên mọi engine dùng được ngay sau khi đọc.
+
+# ======================================== LoLA ========================================================
+_LOLA_COMMENT = re.compile(r"\{[^}]*\}")
+_LOLA_TOKEN = re.compile(r"[,;:]|[^\s,;:{}]+")
+_LOLA_IDENT = re.compile(r"[^\s,;:{}()]+")
+_LOLA_KEYWORDS = {"PLACE", "MARKING", "TRANSITION", "CONSUME", "PRODUCE", "SAFE", "STRONG", "WEAK", "FAIR"}
+
+def _read_text(file_path):
+    with open(file_path, encoding="utf-8") as f:
+        return f.read()
+
+def read_lola(net, file_path):
+    """Đọc file LoLA vào net. Ném ValueError nếu sai cú pháp."""
+    tokens = _LOLA_TOKEN.findall(_LOLA_COMMENT.sub(" ", _read_text(file_path)))
+    pos = 0
+
+    def expect(word):
+        nonlocal pos
+        if pos >= len(tokens) or tokens[pos] != word:
+            found = tokens[pos] if pos < len(tokens) else "EOF"
+            raise ValueError(f"LoLA: cần '{word}' nhưng gặp '{found}'")
+        pos += 1
+
+    def read_weighted_list():
+        # "id [: n], id [: n], ... ;" -> [(id, n)], n mặc định là 1
+        nonlocal pos
+        items = []
+        while tokens[pos] != ";":
+            ident = tokens[pos]
+            pos += 1
+            weight = 1
+            if tokens[pos] == ":":
+                weight = int(tokens[pos + 1])
+                pos += 2
+            items.append((ident, weight))
+            if tokens[pos] == ",":
+                pos += 1
+        pos += 1
+        return items
+
+    try:
+        # 1. PLACE: các nhóm "[SAFE k :] p1, p2, ... ;" cho tới MARKING
+        expect("PLACE")
+        place_ids = []
+        while tokens[pos] != "MARKING":
+            tok = tokens[pos]
+            if tok == "SAFE":
+                pos += 3 if tokens[pos + 2] == ":" else 2
+                continue
+            if tok not in (",", ";"):
+                place_ids.append(tok)
+            pos += 1
+
+        # 2. MARKING
+        expect("MARKING")
+        marking = dict(read_weighted_list())
+
+        # 3. TRANSITION ... CONSUME ...; PRODUCE ...;
+        transitions = []
+        while pos < len(tokens):
+            while tokens[pos] in ("STRONG", "WEAK", "FAIR"):
+                pos += 1
+            expect("TRANSITION")
+            t_id = tokens[pos]
+            pos += 1
+            expect("CONSUME")
+            consume = read_weighted_list()
+            expect("PRODUCE")
+            produce = read_weighted_list()
+            transitions.append((t_id, consume, produce))
+    except IndexError:
+        raise ValueError("LoLA: file kết thúc đột ngột")
+
+    for p_id in place_ids:
+        net.add_place(p_id, marking.get(p_id, 0))
+    for t_id, _, _ in transitions:
+        net.add_transition(t_id)
+    for t_id, consume, produce in transitions:
+        for p_id, weight in consume:
+            net.add_arc(p_id, t_id, weight)
+        for p_id, weight in produce:
+            net.add_arc(t_id, p_id, weight)
+    return net
+
+def _lola_ident(node_id):
+    if not _LOLA_IDENT.fullmatch(node_id) or node_id in _LOLA_KEYWORDS:
+        raise ValueError(f"LoLA: id '{node_id}' không biểu diễn được")
+    return node_id
+
+def _lola_list(weights):
+    return ", ".join(f"{_lola_ident(p_id)} : {w}" for p_id, w in weights.items())
+
+def write_lola(net, file_path):
+    """Ghi net ra file LoLA (tên hiển thị của place không được lưu)."""
+    lines = ["PLACE"]
+    lines.append("  " + ", ".join(_lola_ident(p_id) for p_id in net.places) + ";")
+    lines.append("MARKING")
+    marked = {p_id: p.initial_marking for p_id, p in net.places.items() if p.initial_marking}
+    lines.append("  " + _lola_list(marked) + ";")
+    for t_id in net.transitions:
+        lines.append(f"TRANSITION {_lola_ident(t_id)}")
+        lines.append(f"  CONSUME {_lola_list(net.pre_weight[t_id])};")
+        lines.append(f"  PRODUCE {_lola_list(net.post_weight[t_id])};")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+# ======================================== Tina (.net) ========================================================
+# Tên có thể là định danh thường hoặc nằm trong ngoặc nhọn {...} (escape bằng \)
+_TINA_TOKEN = re.compile(r"\{(?:\\.|[^\\}])*\}\S*|->|\([^)]*\)|[\[\]][^\[\]]*[\[\]]|:|[^\s:]+")
+_TINA_ARC = re.compile(r"(\{(?:\\.|[^\\}])*\}|[^*?!{}]+)(?:\*(\d+[KM]?))?")
+_TINA_PLAIN = re.compile(r"[A-Za-z0-9_'`]+")
+_TINA_ESCAPE = re.compile(r"\\(.)")
+
+def _tina_name(token):
+    if token.startswith("{"):
+        return _TINA_ESCAPE.sub(r"\1", token[1:-1])
+    return token
+
+def _tina_int(text):
+    # Tina cho phép hậu tố K (x1000) và M (x1000000)
+    scale = {"K": 1000, "M": 1000000}.get(text[-1:], 1)
+    return int(text[:-1] if scale > 1 else text) * scale
+
+def _tina_arc(token):
+    match = _TINA_ARC.fullmatch(token)
+    if match is None:
+        # Test arc (?), inhibitor arc (?-) và reset arc (!) không có trong mô hình P/T
+        raise ValueError(f"Tina: arc '{token}' không được hỗ trợ")
+    return _tina_name(match.group(1)), _tina_int(match.group(2)) if match.group(2) else 1
+
+def read_tina(net, file_path):
+    """Đọc file .net của Tina vào net. Ném ValueError nếu gặp cấu trúc không hỗ trợ."""
+    places = {}        # id -> [marking, label]
+    transitions = []   # id theo thứ tự khai báo
+    arcs = []          # (source, target, weight)
+
+    for line_no, line in enumerate(_read_text(file_path).splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        tokens = _TINA_TOKEN.findall(line)
+        kind = tokens[0]
+        if kind not in ("pl", "tr"):
+            continue # net, lb, nt, pr: không ảnh hưởng cấu trúc
+        if len(tokens) < 2:
+            raise ValueError(f"Tina dòng {line_no}: thiếu tên")
+        node_id = _tina_name(tokens[1])
+        pos, label, marking = 2, None, None
+        if pos + 1 < len(tokens) and tokens[pos] == ":":
+            label = _tina_name(tokens[pos + 1])
+            pos += 2
+        if pos < len(tokens) and tokens[pos][0] in "([]":
+            if kind == "pl":
+                marking = _tina_int(tokens[pos][1:-1].strip())
+            pos += 1 # transition: bỏ qua khoảng thời gian [a,b]
+
+        rest = tokens[pos:]
+        arrow = rest.index("->") if "->" in rest else len(rest)
+        inputs = [_tina_arc(tok) for tok in rest[:arrow]]
+        outputs = [_tina_arc(tok) for tok in rest[arrow + 1:]]
+
+        if kind == "pl":
+            entry = places.setdefault(node_id, [0, None])
+            if marking is not None:
+                entry[0] = marking
+            if label is not None:
+                entry[1] = label
+            # "pl p t1 -> t2": t1 sinh token vào p, t2 lấy token từ p
+            arcs.extend((t_id, node_id, w) for t_id, w in inputs)
+            arcs.extend((node_id, t_id, w) for t_id, w in outputs)
+        else:
+            transitions.append(node_id)
+            for p_id, w in inputs + outputs:
+                places.setdefault(p_id, [0, None])
+            arcs.extend((p_id, node_id, w) for p_id, w in inputs)
+            arcs.extend((node_id, p_id, w) for p_id, w in outputs)
+
+    for p_id, (marking, label) in places.items():
+        net.add_place(p_id, marking, label)
+    for t_id in transitions:
+        net.add_transition(t_id)
+    for source, target, weight in arcs:
+        net.add_arc(source, target, weight)
+    return net
+
+def _tina_quote(name):
+    if _TINA_PLAIN.fullmatch(name):
+        return name
+    return "{" + re.sub(r"([{}\\])", r"\\\1", name) + "}"
+
+def _tina_arcs(weights):
+    return " ".join(_tina_quote(p_id) + (f"*{w}" if w != 1 else "") for p_id, w in weights.items())
+
+def write_tina(net, file_path, net_name="net"):
+    """Ghi net ra file .net của Tina; tên place khác id được ghi thành label."""
+    lines = [f"net {_tina_quote(net_name)}"]
+    for p_id, p in net.places.items():
+        line = f"pl {_tina_quote(p_id)}"
+        if p.name and p.name != p_id:
+            line += f" : {_tina_quote(p.name)}"
+        line += f" ({p.initial_marking})"
+        lines.append(line)
+    for t_id in net.transitions:
+        parts = ["tr", _tina_quote(t_id), _tina_arcs(net.pre_weight[t_id]), "->", _tina_arcs(net.post_weight[t_id])]
+        lines.append(" ".join(part for part in parts if part))
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+# ======================================== PNML (chỉ ghi) ========================================================
+def _open_for_write(file_path):
+    # Nén theo đuôi file, khớp với các định dạng load_pnml đọc được
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, "wt", encoding="utf-8")
+    if file_path.endswith(".xz"):
+        return lzma.open(file_path, "wt", encoding="utf-8")
+    return open(file_path, "w", encoding="utf-8")
+
+def _pnml_lines(net, net_id):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<pnml>\n'
+    yield f'  <net id={quoteattr(net_id)} type="http://www.pnml.org/version-2009/grammar/ptnet">\n'
+    yield '    <page id="page1">\n'
+    for p_id, p in net.places.items():
+        yield (f'      <place id={quoteattr(p_id)}><name><text>{escape(p.name)}</text></name>'
+               f'<initialMarking><text>{p.initial_marking}</text></initialMarking></place>\n')
+    for t_id in net.transitions:
+        yield f'      <transition id={quoteattr(t_id)}/>\n'
+    arcs = net.arcs
+    for j, (source, target, weight) in enumerate(zip(arcs.source_ids, arcs.target_ids, arcs.weights)):
+        if weight == 1:
+            yield f'      <arc id="a{j}" source={quoteattr(source)} target={quoteattr(target)}/>\n'
+        else:
+            yield (f'      <arc id="a{j}" source={quoteattr(source)} target={quoteattr(target)}>'
+                   f'<inscription><text>{weight}</text></inscription></arc>\n')
+    yield '    </page>\n'
+    yield '  </net>\n'
+    yield '</pnml>\n'
+
+def write_pnml(net, file_path, net_id="net"):
+    """Ghi net ra file PNML (P/T net, một page); đuôi .gz/.xz thì nén tương ứng."""
+    with _open_for_write(file_path) as f:
+        f.writelines(_pnml_lines(net, net_id))
@@ -1,11 +1,43 @@
 import xml.etree.ElementTree as ET
-from collections import deque
+from array import array
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from dd import autoref as _bdd
+import gzip
+import hashlib
+import lzma
+import multiprocessing
 import os
+import queue
 import re
+import shutil
+import struct
 import subprocess
+import sys
+import tempfile
+import traceback
+import zlib
 
+# Module phụ trợ trong cùng thư mục: import tương đối khi dùng như package (from src.petrinet import ...),
+# import tuyệt đối khi src/ nằm trên sys.path (python src/main.py)
+try:
+    from . import codegen as _codegen, external_store as _external_store, state_store as _state_store
+except ImportError:
+    import codegen as _codegen, external_store as _external_store, state_store as _state_store
+
+try:
+    import numpy as np
+except ImportError: # NumPy là tùy chọn: chỉ cần cho ma trận incidence và các engine vector hóa
+    np = None
+
+# Định dạng cache nhị phân của net đã biên dịch (file "<pnml>.pnc" đặt cạnh file PNML)
+CACHE_SUFFIX = ".pnc"
+_CACHE_MAGIC = b"PNC2"
+_CACHE_HEADER = struct.Struct("<4s32sIII")  # magic, sha256 của file nguồn, #places, #transitions, #bytes chuỗi
+
+# Place/Transition/Arc dùng __slots__ (không có __dict__ riêng cho từng object) để net lớn tốn ít bộ nhớ
 class Place:
+    __slots__ = ("id", "initial_marking", "name")
     def __init__(self, id, initial_marking=0):
         self.id = id
         self.initial_marking = initial_marking
@@ -14,24 +46,531 @@ class Place:
         return f"Place({self.id}, {self.initial_marking})"
 
 class Transition:
+    __slots__ = ("id",)
     def __init__(self, id):
         self.id = id
     def __repr__(self):
         return f"Trans({self.id})"
 
 class Arc:
-    def __init__(self, source_id, target_id):
+    __slots__ = ("source_id", "target_id", "weight")
+    def __init__(self, source_id, target_id, weight=1):
         self.source_id = source_id
         self.target_id = target_id
+        self.weight = weight
+    def __repr__(self):
+        return f"Arc({self.source_id} -> {self.target_id}, {self.weight})"
+
+class ArcList:
+    """
+    Danh sách arc lưu dạng mảng song song: hai list tham chiếu tới id nguồn/đích (chuỗi đã
+    intern, dùng chung với key của places/transitions) và một array trọng số.
+    Object Arc chỉ được tạo khi duyệt/truy cập (view tạm, sửa view không đổi dữ liệu gốc),
+    nên mỗi arc tốn khoảng 20 byte thay vì một object riêng.
+    """
+    __slots__ = ("source_ids", "target_ids", "weights")
+
+    def __init__(self, arcs=()):
+        self.source_ids = []
+        self.target_ids = []
+        self.weights = array('I')
+        self.extend(arcs)
+
+    def append(self, arc):
+        self.source_ids.append(arc.source_id)
+        self.target_ids.append(arc.target_id)
+        self.weights.append(arc.weight)
+
+    def extend(self, arcs):
+        for arc in arcs:
+            self.append(arc)
+
+    def remove_between(self, source, target):
+        # Xóa mọi arc source -> target, trả về số arc đã xóa
+        keep = [j for j in range(len(self.weights))
+                if self.source_ids[j] != source or self.target_ids[j] != target]
+        removed = len(self.weights) - len(keep)
+        if removed:
+            self.source_ids = [self.source_ids[j] for j in keep]
+            self.target_ids = [self.target_ids[j] for j in keep]
+            self.weights = array('I', [self.weights[j] for j in keep])
+        return removed
+
+    def __len__(self):
+        return len(self.weights)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return Arc(self.source_ids[i], self.target_ids[i], self.weights[i])
+
+    def __iter__(self):
+        for source, target, weight in zip(self.source_ids, self.target_ids, self.weights):
+            yield Arc(source, target, weight)
+
+    def __repr__(self):
+        return f"ArcList({len(self)} arcs)"
+
+class SparseMatrix:
+    """
+    Ma trận thưa dạng CSR trên NumPy: hàng r gồm các cột indices[indptr[r]:indptr[r+1]]
+    với giá trị data tương ứng. Dạng CSC của A chính là CSR của A.T (thuộc tính T, có cache).
+    """
+    def __init__(self, indptr, indices, data, shape):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.shape = shape
+        self._transpose = None
+
+    @classmethod
+    def from_rows(cls, rows, num_cols):
+        # rows[r]: dãy các cặp (cột, giá trị), mỗi cột xuất hiện tối đa một lần trong một hàng
+        counts = np.fromiter((len(r) for r in rows), dtype=np.int64, count=len(rows))
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        nnz = int(indptr[-1])
+        indices = np.fromiter((c for r in rows for c, _ in r), dtype=np.int64, count=nnz)
+        data = np.fromiter((v for r in rows for _, v in r), dtype=np.int64, count=nnz)
+        return cls(indptr, indices, data, (len(rows), num_cols))
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    def _row_ids(self):
+        # Chỉ số hàng của từng phần tử khác 0 (dạng COO)
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    @property
+    def T(self):
+        if self._transpose is None:
+            order = np.argsort(self.indices, kind="stable")
+            indptr = np.zeros(self.shape[1] + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=self.shape[1]), out=indptr[1:])
+            transpose = SparseMatrix(indptr, self._row_ids()[order], self.data[order], (self.shape[1], self.shape[0]))
+            transpose._transpose = self
+            self._transpose = transpose
+        return self._transpose
+
+    def row(self, r):
+        # (chỉ số cột, giá trị) của hàng r
+        start, end = self.indptr[r], self.indptr[r + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def dot(self, x):
+        # Tích ma trận - vector A @ x
+        result = np.zeros(self.shape[0], dtype=np.result_type(self.data, x))
+        np.add.at(result, self._row_ids(), self.data * np.asarray(x)[self.indices])
+        return result
+
+    def toarray(self):
+        dense = np.zeros(self.shape, dtype=self.data.dtype)
+        dense[self._row_ids(), self.indices] = self.data
+        return dense
+
+    def __repr__(self):
+        return f"SparseMatrix({self.shape[0]}x{self.shape[1]}, nnz={self.nnz})"
+
+class PackedLayout:
+    """
+    Mã hóa marking của net k-bounded vào MỘT số nguyên: place i chiếm một trường widths[i] bit
+    (đủ chứa bounds[i] và mọi trọng số arc của nó), phía trên mỗi trường có 1 bit bảo vệ.
+    Nhờ bit bảo vệ, kiểm tra enable và bắn transition là vài phép cộng/trừ trên cả số nguyên
+    thay vì lặp từng place:
+        enable  <=>  ((m | G) - pre) & G == G     (không trường nào phải mượn)
+        bắn:         m' = m + (post - pre)
+        vượt bound <=> (m' | (m' + L)) & G != 0   (L đệm mỗi trường tới 2^w - 1 - bound)
+    """
+    def __init__(self, net, bounds):
+        self.net = net
+        self.bounds = list(bounds)
+        self.offsets = []
+        self.widths = []
+        max_weight = [0] * net.num_places
+        for arcs in net.pre + net.post:
+            for i, w in arcs:
+                max_weight[i] = max(max_weight[i], w)
+        offset = 0
+        for i, bound in enumerate(self.bounds):
+            width = max(bound, max_weight[i], 1).bit_length()
+            self.offsets.append(offset)
+            self.widths.append(width)
+            offset += width + 1
+        self.guard_mask = sum(1 << (off + w) for off, w in zip(self.offsets, self.widths))
+        self.limit_pad = sum(((1 << w) - 1 - b) << off for off, w, b in zip(self.offsets, self.widths, self.bounds))
+        # (k, pre đã pack, delta = post - pre đã pack) cho từng transition
+        self.transitions = []
+        for k in range(net.num_transitions):
+            pre_packed = self.pack_pairs(net.pre[k])
+            self.transitions.append((k, pre_packed, self.pack_pairs(net.post[k]) - pre_packed))
+
+    def pack_pairs(self, pairs):
+        return sum(w << self.offsets[i] for i, w in pairs)
+
+    def pack(self, marking):
+        # Giá trị rộng hơn trường sẽ tràn sang bit bảo vệ và trường kế bên -> phải từ chối
+        for i, tokens in enumerate(marking):
+            if not 0 <= tokens < 1 << self.widths[i]:
+                raise OverflowError(f"{tokens} token không vừa trường {self.widths[i]} bit của place '{self.net.place_ids[i]}'")
+        return self.pack_pairs(enumerate(marking))
+
+    def unpack(self, packed):
+        return tuple((packed >> off) & ((1 << (w + 1)) - 1) for off, w in zip(self.offsets, self.widths))
+
+    def exceeds_bounds(self, packed):
+        return (packed | (packed + self.limit_pad)) & self.guard_mask != 0
+
+    def violated_places(self, packed):
+        # Chỉ gọi ở nhánh lỗi: liệt kê các place vượt bound
+        return [self.net.place_ids[i] for i, tokens in enumerate(self.unpack(packed)) if tokens > self.bounds[i]]
+
+# Kiểu phần tử dùng để lưu token của marking, từ gọn nhất tới rộng nhất (1, 2, 4, 8 byte/place)
+MARKING_TYPECODES = ("B", "H", "I", "Q")
+
+class MarkingSet(set):
+    """
+    Tập visited chính xác của BFS: mỗi marking là bytes số token (array theo typecode, thứ tự place
+    canonical). bytes là bất biến và tự cache hash, nên không cần bọc thêm object cho từng marking.
+    """
+    def add(self, data):
+        """Thêm marking; trả về True nếu nó chưa có trong tập (giao diện chung với state_store)."""
+        if data in self:
+            return False
+        set.add(self, data)
+        return True
+
+class _HashCollision(Exception):
+    # Hai marking khác nhau trùng khóa băm trong run_reachability_frontier -> duyệt lại với khóa chính xác
+    pass
+
+# Pre, Post, C = Post - Pre của một net, hàng = place, cột = transition
+IncidenceMatrices = namedtuple("IncidenceMatrices", ["pre", "post", "incidence"])
+
+class CompiledNet:
+    """
+    Dạng biên dịch của PetriNet cho các engine: place và transition được đánh số nguyên
+    liên tiếp theo một thứ tự canonical cố định (place theo natural_keys, transition theo
+    thứ tự đọc). Marking là tuple số token theo đúng thứ tự place_ids, nên vòng lặp nóng
+    chỉ làm việc với chỉ số nguyên, không tra dict theo id chuỗi và không sort lại.
+    """
+    def __init__(self, net):
+        self.place_ids = list(net.structure().place_order())
+        self.transition_ids = list(net.transitions)
+        self.place_index = {p_id: i for i, p_id in enumerate(self.place_ids)}
+        self.transition_index = {t_id: k for k, t_id in enumerate(self.transition_ids)}
+        self.num_places = len(self.place_ids)
+        self.num_transitions = len(self.transition_ids)
+        self.initial = tuple(net.places[p_id].initial_marking for p_id in self.place_ids)
+
+        index = self.place_index
+        # pre[k] / post[k]: tuple các cặp (chỉ số place, trọng số arc) của transition thứ k
+        self.pre = [tuple((index[p_id], w) for p_id, w in net.pre_weight[t_id].items()) for t_id in self.transition_ids]
+        self.post = [tuple((index[p_id], w) for p_id, w in net.post_weight[t_id].items()) for t_id in self.transition_ids]
+        # delta[k]: các cặp (chỉ số place, thay đổi token khác 0) khi bắn transition thứ k
+        self.delta = []
+        for k in range(self.num_transitions):
+            change = {}
+            for i, w in self.pre[k]:
+                change[i] = change.get(i, 0) - w
+            for i, w in self.post[k]:
+                change[i] = change.get(i, 0) + w
+            self.delta.append(tuple((i, d) for i, d in sorted(change.items()) if d))
+        # consumers[i]: các transition lấy token từ place i (chỉ mục ngược place -> transition)
+        consumers = [[] for _ in range(self.num_places)]
+        for k in range(self.num_transitions):
+            for i, _ in self.pre[k]:
+                consumers[i].append(k)
+        self.consumers = [tuple(ks) for ks in consumers]
+        # affected[k]: các transition cần kiểm tra lại enable sau khi bắn k
+        # (chỉ những transition đọc từ place có số token thay đổi)
+        self.affected = [
+            frozenset(u for i, _ in self.delta[k] for u in self.consumers[i])
+            for k in range(self.num_transitions)
+        ]
+        self._incidence = None
+        self._bit_masks = None
+
+    def is_enabled(self, marking, k):
+        for i, w in self.pre[k]:
+            if marking[i] < w:
+                return False
+        return True
+
+    def enabled_set(self, marking):
+        # Danh sách chỉ số các transition enable tại marking (tăng dần)
+        return [k for k in range(self.num_transitions) if self.is_enabled(marking, k)]
+
+    def marking_dict(self, marking):
+        # Tuple marking -> dict {place_id: số token} để in/hiển thị
+        return dict(zip(self.place_ids, marking))
+
+    def bit_masks(self):
+        """
+        Mask bit cho net 1-safe: danh sách (k, pre_mask, ~pre_mask, post_mask), bit i ứng với place thứ i.
+        Transition cần >= 2 token ở một input không bao giờ enable nên bị bỏ qua.
+        """
+        if self._bit_masks is None:
+            if any(m > 1 for m in self.initial):
+                raise ValueError("Initial marking có place nhiều hơn 1 token, không dùng được bitset")
+            masks = []
+            for k in range(self.num_transitions):
+                if any(w > 1 for _, w in self.pre[k]):
+                    continue
+                if any(w > 1 for _, w in self.post[k]):
+                    raise ValueError(f"Transition '{self.transition_ids[k]}' thêm nhiều hơn 1 token vào một place, không dùng được bitset")
+                pre_mask = 0
+                for i, _ in self.pre[k]:
+                    pre_mask |= 1 << i
+                post_mask = 0
+                for i, _ in self.post[k]:
+                    post_mask |= 1 << i
+                masks.append((k, pre_mask, ~pre_mask, post_mask))
+            self._bit_masks = masks
+        return self._bit_masks
+
+    def marking_to_bits(self, marking):
+        bits = 0
+        for i, tokens in enumerate(marking):
+            if tokens:
+                bits |= 1 << i
+        return bits
+
+    def bits_to_marking(self, bits):
+        return tuple((bits >> i) & 1 for i in range(self.num_places))
+
+    def incidence_matrices(self):
+        """
+        Ma trận Pre, Post và incidence C = Post - Pre (kích thước |P| x |T|) dạng CSR thưa.
+        Dựng một lần rồi giữ lại trên CompiledNet, các engine đại số tuyến tính dùng chung.
+        """
+        if self._incidence is None:
+            if np is None:
+                raise ImportError("Cần cài numpy để dùng ma trận incidence (pip install numpy)")
+            # Dựng theo hàng = transition (|T| x |P|) rồi chuyển vị về |P| x |T|
+            pre_t = SparseMatrix.from_rows(self.pre, self.num_places)
+            post_t = SparseMatrix.from_rows(self.post, self.num_places)
+            c_t = SparseMatrix.from_rows(self.delta, self.num_places)
+            self._incidence = IncidenceMatrices(pre_t.T, post_t.T, c_t.T)
+        return self._incidence
+
+    def __repr__(self):
+        return f"CompiledNet({self.num_places} places, {self.num_transitions} transitions)"
+
+class StructureCache:
+    """
+    Các dữ kiện cấu trúc của net (chỉ phụ thuộc place/transition/arc, không phụ thuộc marking).
+    Mỗi dữ kiện được tính lười đúng một lần; PetriNet bỏ cả cache mỗi khi cấu trúc thay đổi
+    (add_*/remove_*/reload_pnml/đọc cache), nên không bao giờ trả về dữ kiện cũ.
+    """
+    def __init__(self, net):
+        self.net = net
+        self._facts = {}
+
+    def _get(self, key, build):
+        facts = self._facts
+        if key not in facts:
+            facts[key] = build()
+        return facts[key]
+
+    def place_order(self):
+        # Thứ tự place canonical (natural_keys), dùng chung cho mọi engine
+        return self._get("place_order", lambda: tuple(sorted(self.net.places, key=self.net.natural_keys)))
+
+    def transition_order(self):
+        # Thứ tự transition canonical: thứ tự khai báo
+        return self._get("transition_order", lambda: tuple(self.net.transitions))
+
+    def pre_sets(self):
+        # T -> frozenset input places
+        return self._get("pre_sets", lambda: {t: frozenset(ps) for t, ps in self.net.pre_set.items()})
+
+    def post_sets(self):
+        # T -> frozenset output places
+        return self._get("post_sets", lambda: {t: frozenset(ps) for t, ps in self.net.post_set.items()})
+
+    def _place_neighbours(self, sets):
+        result = {p_id: [] for p_id in self.net.places}
+        for t_id in self.transition_order():
+            for p_id in sets[t_id]:
+                result.setdefault(p_id, []).append(t_id)
+        return result
+
+    def consumers(self):
+        # P -> frozenset transition lấy token từ P
+        return self._get("consumers", lambda: {
+            p_id: frozenset(ts) for p_id, ts in self._place_neighbours(self.net.pre_set).items()
+        })
+
+    def producers(self):
+        # P -> frozenset transition đặt token vào P
+        return self._get("producers", lambda: {
+            p_id: frozenset(ts) for p_id, ts in self._place_neighbours(self.net.post_set).items()
+        })
+
+    def conflict_clusters(self):
+        """
+        Các cụm xung đột: lớp tương đương nhỏ nhất của transition sao cho hai transition
+        có chung một input place thì cùng cụm. Trả về list frozenset, theo thứ tự transition đầu tiên.
+        """
+        return self._get("conflict_clusters", self._build_conflict_clusters)
+
+    def _build_conflict_clusters(self):
+        parent = {t_id: t_id for t_id in self.transition_order()}
+
+        def find(t_id):
+            root = t_id
+            while parent[root] != root:
+                root = parent[root]
+            while parent[t_id] != root:
+                parent[t_id], t_id = root, parent[t_id]
+            return root
+
+        for ts in self._place_neighbours(self.net.pre_set).values():
+            for t_id in ts[1:]:
+                parent[find(t_id)] = find(ts[0])
+
+        clusters = {}
+        for t_id in self.transition_order():
+            clusters.setdefault(find(t_id), []).append(t_id)
+        return [frozenset(ts) for ts in clusters.values()]
+
+    def sccs(self):
+        """
+        Các thành phần liên thông mạnh của đồ thị net (đỉnh = place và transition, cạnh = arc).
+        Trả về list frozenset id, thành phần nào không có cạnh ra thành phần khác chưa liệt kê thì đứng trước.
+        """
+        return self._get("sccs", self._build_sccs)
+
+    def _build_sccs(self):
+        # Tarjan viết bằng stack tường minh (net lớn sẽ vượt giới hạn đệ quy của Python)
+        successors = self._place_neighbours(self.net.pre_set)
+        successors.update((t_id, self.net.post_set[t_id]) for t_id in self.transition_order())
+        index, low = {}, {}
+        stack, on_stack, result = [], set(), []
+
+        for root in self.place_order() + self.transition_order():
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(successors[root]))]
+            while work:
+                node, it = work[-1]
+                for nxt in it:
+                    if nxt not in index:
+                        index[nxt] = low[nxt] = len(index)
+                        stack.append(nxt)
+                        on_stack.add(nxt)
+                        work.append((nxt, iter(successors.get(nxt, ()))))
+                        break
+                    if nxt in on_stack:
+                        low[node] = min(low[node], index[nxt])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        result.append(frozenset(component))
+        return result
+
+    def fingerprint(self):
+        # Fingerprint bất biến theo đổi tên/đổi thứ tự phần tử (xem wl_fingerprint)
+        return self._get("fingerprint", lambda: wl_fingerprint(self.net.compile()))
+
+    def __repr__(self):
+        return f"StructureCache({sorted(self._facts)})"
+
+def wl_fingerprint(net, max_rounds=16):
+    """
+    Fingerprint chuẩn (hex sha256) của CompiledNet, không phụ thuộc id/tên và thứ tự phần tử:
+    tinh chỉnh màu kiểu Weisfeiler–Lehman trên đồ thị place/transition.
+      - Màu ban đầu: place = initial marking, transition = 0.
+      - Mỗi vòng: màu mới của một node = (màu cũ, multiset (trọng số arc, màu hàng xóm) vào, ... ra),
+        đánh số lại bằng cách sort các chữ ký (không dùng tên nên net đẳng cấu cho cùng số màu).
+      - Dừng khi số màu không tăng nữa hoặc sau max_rounds vòng (mỗi vòng O(|P|+|T|+|arc|) cộng
+        chi phí sort; giới hạn số vòng giữ tổng thời gian gần tuyến tính cả với net có đường kính lớn
+        như vòng tròn dài); histogram chữ ký của mọi vòng được băm vào fingerprint.
+    Net đẳng cấu luôn cho cùng fingerprint. Chiều ngược lại đúng với hầu hết net thực tế, nhưng
+    như mọi phép thử WL, vẫn có cặp net rất đối xứng khác nhau mà không phân biệt được.
+    """
+    num_places, num_transitions = net.num_places, net.num_transitions
+    place_in = [[] for _ in range(num_places)]   # (trọng số, transition) sinh token vào place
+    place_out = [[] for _ in range(num_places)]  # (trọng số, transition) lấy token từ place
+    for k in range(num_transitions):
+        for i, w in net.pre[k]:
+            place_out[i].append((w, k))
+        for i, w in net.post[k]:
+            place_in[i].append((w, k))
+
+    digest = hashlib.sha256(repr((num_places, num_transitions)).encode("utf-8"))
+    place_color = list(net.initial)
+    trans_color = [0] * num_transitions
+    num_colors = -1
+    for _ in range(max_rounds):
+        place_sig = [
+            (place_color[i],
+             tuple(sorted((w, trans_color[k]) for w, k in place_in[i])),
+             tuple(sorted((w, trans_color[k]) for w, k in place_out[i])))
+            for i in range(num_places)
+        ]
+        trans_sig = [
+            (trans_color[k],
+             tuple(sorted((w, place_color[i]) for i, w in net.pre[k])),
+             tuple(sorted((w, place_color[i]) for i, w in net.post[k])))
+            for k in range(num_transitions)
+        ]
+        place_palette = {sig: c for c, sig in enumerate(sorted(set(place_sig)))}
+        trans_palette = {sig: c for c, sig in enumerate(sorted(set(trans_sig)))}
+        # Histogram (chữ ký, số node) của vòng này; chữ ký chỉ chứa số nên repr ổn định
+        for palette, sigs in ((place_palette, place_sig), (trans_palette, trans_sig)):
+            counts = [0] * len(palette)
+            for sig in sigs:
+                counts[palette[sig]] += 1
+            digest.update(repr(list(zip(palette, counts))).encode("utf-8"))
+        place_color = [place_palette[sig] for sig in place_sig]
+        trans_color = [trans_palette[sig] for sig in trans_sig]
+        if len(place_palette) + len(trans_palette) == num_colors:
+            break
+        num_colors = len(place_palette) + len(trans_palette)
+    return digest.hexdigest()
 
 class PetriNet:
     def __init__(self):
         self.places = {}      
         self.transitions = {}
-        self.arcs = []
+        self.arcs = ArcList()
         # Cache để tra cứu nhanh input/output của từng transition
         self.pre_set = {}  # Input places của transition: T -> {P}
         self.post_set = {} # Output places của transition: T -> {P}
+        # Trọng số arc (inscription), mặc định 1
+        self.pre_weight = {}  # T -> {P: số token bị lấy}
+        self.post_weight = {} # T -> {P: số token được thêm}
+        # Artifact dẫn xuất được giữ lại giữa các lần chạy (xem reload_pnml)
+        self._bdd = None          # BDD manager của lần chạy trước
+        self._bdd_places = None   # Danh sách place đã khai báo biến trong manager đó
+        self._bdd_relations = {}  # T -> (chữ ký pre/post, quan hệ chuyển trạng thái BDD hoặc None)
+        self._compiled = None     # CompiledNet, dựng lười trong compile()
+        self._structure = None    # StructureCache, dựng lười trong structure()
+
+    def release_bdd(self):
+        """Bỏ BDD manager giữ lại giữa các lần chạy; các quan hệ phải được bỏ trước manager."""
+        # dd báo "nodes still referenced" nếu manager bị hủy khi Function của nó còn sống
+        self._bdd_relations = {}
+        self._bdd = None
+        self._bdd_places = None
+
+    def __del__(self):
+        self.release_bdd()
 
     @staticmethod
     def natural_keys(text):
@@ -40,66 +579,559 @@ class PetriNet:
             return (int(match.group(1)), text)
         return (float('inf'), text)
 
-    def load_pnml(self, file_path):
+    def structure(self):
+        """Trả về StructureCache của net (thứ tự canonical, pre/post, cụm xung đột, SCC)."""
+        if self._structure is None:
+            self._structure = StructureCache(self)
+        return self._structure
+
+    def _invalidate_structure(self):
+        # Gọi sau MỌI thay đổi place/transition/arc: bỏ các dữ kiện dẫn xuất từ cấu trúc cũ
+        self._compiled = None
+        self._structure = None
+
+    def fingerprint(self):
+        """Fingerprint cấu trúc bất biến theo tên/thứ tự phần tử; net đẳng cấu cho cùng giá trị."""
+        self.compile()   # fingerprint gồm cả initial marking: bỏ cache nếu marking đã đổi
+        return self.structure().fingerprint()
+
+    def compile(self):
+        """
+        Trả về CompiledNet của net: dựng một lần, dùng lại cho tới khi cấu trúc net thay đổi.
+        Place.initial_marking có thể bị gán lại trực tiếp, nên mỗi lần gọi đều so lại
+        initial marking (O(|P|)) và dựng lại nếu khác.
+        """
+        compiled = self._compiled
+        if compiled is not None:
+            places = self.places
+            if tuple(places[p_id].initial_marking for p_id in compiled.place_ids) != compiled.initial:
+                self._invalidate_structure()
+        if self._compiled is None:
+            self._compiled = CompiledNet(self)
+        return self._compiled
+
+    def incidence_matrices(self, dense=False, max_dense_size=10_000_000):
+        """
+        Ma trận Pre, Post và C = Post - Pre (hàng = place theo thứ tự canonical, cột = transition).
+
+        Args:
+            dense: False -> SparseMatrix (CSR, .T cho CSC); True -> numpy.ndarray dày
+            max_dense_size: giới hạn |P| x |T| khi lấy dạng dày (chỉ dành cho net nhỏ)
+        """
+        matrices = self.compile().incidence_matrices()
+        if not dense:
+            return matrices
+        rows, cols = matrices.pre.shape
+        if rows * cols > max_dense_size:
+            raise ValueError(f"Net quá lớn để dùng ma trận dày ({rows} x {cols}), hãy dùng dạng thưa")
+        return IncidenceMatrices(*(m.toarray() for m in matrices))
+
+    @staticmethod
+    def _local_tag(tag):
+        # Bỏ namespace: "{http://www.pnml.org/...}place" -> "place"
+        return tag.rsplit('}', 1)[-1]
+
+    def load_pnml(self, file_path, use_cache=False):
+        """
+        Đọc file PNML vào net.
+        use_cache=True: đọc/ghi bản nhị phân "<file_path>.pnc" cạnh file PNML. Cache được
+        khóa bằng SHA-256 của file nguồn nên tự mất hiệu lực khi file PNML thay đổi.
+        """
         try:
-            tree = ET.parse(file_path)
-            root = tree.getroot()
-            
-            # 1. Đọc Places
-            for p in root.findall(".//{*}place"):
-                p_id = p.get('id')
+            if use_cache:
+                digest = self._file_digest(file_path)
+                cache_path = file_path + CACHE_SUFFIX
+                if self._load_cache(cache_path, digest):
+                    print(f"ĐỌC CACHE THÀNH CÔNG: {len(self.places)} places, {len(self.transitions)} transitions.")
+                    return True
+                self._parse_pnml(file_path)
+                self._save_cache(cache_path, digest)
+            else:
+                self._parse_pnml(file_path)
+            print(f"ĐỌC FILE THÀNH CÔNG: {len(self.places)} places, {len(self.transitions)} transitions.")
+            return True
+        except Exception as e:
+            print(f"Lỗi đọc file: {e}")
+            return False
+
+    def _parse_pnml(self, file_path):
+        """
+        Đọc PNML trong MỘT lượt duyệt bằng iterparse (không dựng cả cây DOM).
+        Mỗi place/transition/arc được xử lý ngay khi gặp thẻ đóng rồi bị xóa khỏi cây,
+        nên bộ nhớ chỉ phụ thuộc vào kích thước net chứ không phụ thuộc kích thước file XML.
+        File nén gzip (.pnml.gz) hoặc xz (.pnml.xz) được giải nén trực tiếp trong lúc đọc.
+        Net nhiều page được làm phẳng: place/transition ở mọi page gộp vào một chỉ mục,
+        referencePlace/referenceTransition được thay bằng node mà chúng tham chiếu.
+        """
+        with self._open_pnml(file_path) as source:
+            self._iterparse_pnml(source)
+
+    @staticmethod
+    def _open_pnml(file_path):
+        # Nhận diện nén theo magic bytes (không dựa vào đuôi file) và giải nén dạng stream,
+        # iterparse đọc thẳng từ luồng giải nén nên không cần file tạm.
+        with open(file_path, "rb") as f:
+            magic = f.read(6)
+        if magic.startswith(b"\x1f\x8b"):
+            return gzip.open(file_path, "rb")
+        if magic.startswith(b"\xfd7zXZ\x00"):
+            return lzma.open(file_path, "rb")
+        return open(file_path, "rb")
+
+    def _iterparse_pnml(self, source):
+        # Arc có đầu mút chưa được khai báo (node nằm phía sau trong file) -> nối sau khi đọc xong
+        pending_arcs = []
+        # Stack các phần tử đang mở, để gỡ phần tử đã xử lý khỏi phần tử cha
+        open_elems = []
+        # referencePlace/referenceTransition (net nhiều page): id tham chiếu -> id được tham chiếu
+        aliases = {}
+
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                open_elems.append(elem)
+                continue
+            open_elems.pop()
+            tag = self._local_tag(elem.tag)
+
+            if tag == "place":
+                # 1. Đọc Place
+                p_id = elem.get('id')
                 init_marking = 0
-                name_tag = p.find(".//{*}name/{*}text")
+                name_tag = elem.find(".//{*}name/{*}text")
                 p_name = name_tag.text if name_tag is not None else p_id
-                init_tag = p.find(".//{*}initialMarking")
+                init_tag = elem.find(".//{*}initialMarking")
                 if init_tag is not None:
                     text_tag = init_tag.find(".//{*}text")
                     if text_tag is not None and text_tag.text:
                         init_marking = int(text_tag.text)
-                new_place = Place(p_id, init_marking)
-                new_place.name = p_name
-                self.places[p_id] = new_place
-
-            # 2. Đọc Transitions
-            for t in root.findall(".//{*}transition"):
-                t_id = t.get('id')
-                self.transitions[t_id] = Transition(t_id)
-                self.pre_set[t_id] = []
-                self.post_set[t_id] = []
-
-            # 3. Đọc Arcs và xây dựng cấu trúc đồ thị
-            for a in root.findall(".//{*}arc"):
-                source = a.get('source')
-                target = a.get('target')
-                self.arcs.append(Arc(source, target))
-                
-                # Map input/output cho dễ truy xuất khi chạy thuật toán
-                if target in self.transitions: # Arc: Place -> Transition (Input)
-                    self.pre_set[target].append(source)
-                elif source in self.transitions: # Arc: Transition -> Place (Output)
-                    self.post_set[source].append(target)
+                self.add_place(p_id, init_marking, p_name)
 
-            print(f"ĐỌC FILE THÀNH CÔNG: {len(self.places)} places, {len(self.transitions)} transitions.")
-            return True
+            elif tag == "transition":
+                # 2. Đọc Transition
+                self.add_transition(elem.get('id'))
+
+            elif tag in ("referencePlace", "referenceTransition"):
+                # Node tham chiếu chỉ là bí danh của node thật ở page khác -> gộp về id gốc
+                aliases[elem.get('id')] = elem.get('ref')
+
+            elif tag == "arc":
+                # 3. Đọc Arc, nối vào pre_set/post_set ngay nếu cả hai đầu đã biết
+                source = self._resolve_ref(aliases, elem.get('source'))
+                target = self._resolve_ref(aliases, elem.get('target'))
+                weight = 1
+                weight_tag = elem.find(".//{*}inscription/{*}text")
+                if weight_tag is not None and weight_tag.text:
+                    weight = int(weight_tag.text)
+                if self._is_node(source) and self._is_node(target):
+                    self.add_arc(source, target, weight)
+                else:
+                    pending_arcs.append((source, target, weight))
+
+            else:
+                continue
+
+            # Giải phóng phần tử đã xử lý để giữ bộ nhớ ở mức cố định
+            elem.clear()
+            if open_elems:
+                open_elems[-1].remove(elem)
+
+        # 4. Nối các arc tham chiếu tới node (hoặc node tham chiếu) khai báo phía sau
+        for source, target, weight in pending_arcs:
+            source = self._resolve_ref(aliases, source)
+            target = self._resolve_ref(aliases, target)
+            self.add_arc(source, target, weight)
+
+    # --- XÂY DỰNG NET BẰNG CODE (dùng chung cho mọi định dạng đầu vào) ---
+
+    def add_place(self, p_id, initial_marking=0, name=None):
+        p_id = sys.intern(str(p_id))
+        new_place = Place(p_id, initial_marking)
+        new_place.name = name if name is not None else p_id
+        self.places[p_id] = new_place
+        self._invalidate_structure()
+        return new_place
+
+    def add_transition(self, t_id):
+        t_id = sys.intern(str(t_id))
+        new_trans = Transition(t_id)
+        self.transitions[t_id] = new_trans
+        self.pre_set[t_id] = []
+        self.post_set[t_id] = []
+        self.pre_weight[t_id] = {}
+        self.post_weight[t_id] = {}
+        self._invalidate_structure()
+        return new_trans
+
+    def add_arc(self, source, target, weight=1):
+        # Arc chỉ được nối vào pre_set/post_set nếu một đầu là transition đã khai báo.
+        # Intern id để arc, pre_set/post_set và key của dict dùng chung một object chuỗi.
+        # Id luôn được đổi về str như add_place/add_transition (id số nguyên, numpy.str_...);
+        # chỉ None (arc PNML thiếu thuộc tính source/target) được giữ nguyên
+        source = sys.intern(str(source)) if source is not None else None
+        target = sys.intern(str(target)) if target is not None else None
+        new_arc = Arc(source, target, weight)
+        self.arcs.append(new_arc)
+        self._link_arc(source, target, weight)
+        self._invalidate_structure()
+        return new_arc
+
+    # Bản "hàng loạt" của add_*: nhận cả dãy (list/tuple/array/generator), chỉ invalidate một lần.
+    # Dùng để dựng net sinh tự động (hàng triệu node) trực tiếp trong bộ nhớ, không qua XML.
+
+    @staticmethod
+    def _bulk_column(values, count, default, what):
+        if values is None:
+            return [default] * count
+        values = list(values)
+        if len(values) != count:
+            raise ValueError(f"{what}: cần {count} phần tử, nhận {len(values)}")
+        return values
+
+    def add_places(self, p_ids, initial_markings=None, names=None):
+        """
+        Thêm nhiều place một lần. initial_markings/names: dãy cùng độ dài với p_ids
+        hoặc None (0 token / tên = id). Trả về số place đã thêm.
+        """
+        intern = sys.intern
+        p_ids = [intern(str(p_id)) for p_id in p_ids]
+        markings = self._bulk_column(initial_markings, len(p_ids), 0, "initial_markings")
+        names = self._bulk_column(names, len(p_ids), None, "names")
+        places = self.places
+        for p_id, marking, name in zip(p_ids, markings, names):
+            place = places[p_id] = Place(p_id, marking)
+            place.name = name if name is not None else p_id
+        self._invalidate_structure()
+        return len(p_ids)
+
+    def add_transitions(self, t_ids):
+        """Thêm nhiều transition một lần. Trả về số transition đã thêm."""
+        intern = sys.intern
+        t_ids = [intern(str(t_id)) for t_id in t_ids]
+        for t_id in t_ids:
+            self.transitions[t_id] = Transition(t_id)
+            self.pre_set[t_id] = []
+            self.post_set[t_id] = []
+            self.pre_weight[t_id] = {}
+            self.post_weight[t_id] = {}
+        self._invalidate_structure()
+        return len(t_ids)
+
+    def add_arcs(self, sources, targets, weights=None):
+        """
+        Thêm nhiều arc một lần: arc thứ j là sources[j] -> targets[j] với trọng số weights[j]
+        (None: mọi trọng số = 1). Trả về số arc đã thêm.
+        """
+        intern = sys.intern
+        sources = [intern(str(x)) if x is not None else None for x in sources]
+        targets = self._bulk_column(
+            (intern(str(x)) if x is not None else None for x in targets), len(sources), None, "targets")
+        weights = array('I', self._bulk_column(weights, len(sources), 1, "weights"))
+        self.arcs.source_ids.extend(sources)
+        self.arcs.target_ids.extend(targets)
+        self.arcs.weights.extend(weights)
+        link = self._link_arc
+        for source, target, weight in zip(sources, targets, weights):
+            link(source, target, weight)
+        self._invalidate_structure()
+        return len(sources)
+
+    def remove_arc(self, source, target):
+        """Xóa (mọi) arc source -> target. Trả về False nếu không có arc nào như vậy."""
+        if not self.arcs.remove_between(source, target):
+            return False
+        if target in self.transitions and source in self.pre_weight[target]:
+            del self.pre_weight[target][source]
+            self.pre_set[target].remove(source)
+        elif source in self.transitions and target in self.post_weight[source]:
+            del self.post_weight[source][target]
+            self.post_set[source].remove(target)
+        self._invalidate_structure()
+        return True
+
+    def remove_transition(self, t_id):
+        """Xóa transition cùng mọi arc nối với nó. Trả về False nếu không có transition này."""
+        if t_id not in self.transitions:
+            return False
+        for p_id in list(self.pre_set[t_id]):
+            self.remove_arc(p_id, t_id)
+        for p_id in list(self.post_set[t_id]):
+            self.remove_arc(t_id, p_id)
+        del self.transitions[t_id]
+        del self.pre_set[t_id], self.post_set[t_id]
+        del self.pre_weight[t_id], self.post_weight[t_id]
+        self._bdd_relations.pop(t_id, None)
+        self._invalidate_structure()
+        return True
+
+    def remove_place(self, p_id):
+        """Xóa place cùng mọi arc nối với nó. Trả về False nếu không có place này."""
+        if p_id not in self.places:
+            return False
+        for t_id in self.transitions:
+            if p_id in self.pre_weight[t_id]:
+                self.remove_arc(p_id, t_id)
+            if p_id in self.post_weight[t_id]:
+                self.remove_arc(t_id, p_id)
+        del self.places[p_id]
+        self._invalidate_structure()
+        return True
+
+    def _is_node(self, node_id):
+        return node_id in self.places or node_id in self.transitions
+
+    @staticmethod
+    def _resolve_ref(aliases, node_id):
+        # Đi theo chuỗi tham chiếu tới node thật; nén đường đi để tổng chi phí tuyến tính
+        if node_id not in aliases:
+            return node_id
+        chain = []
+        while node_id in aliases:
+            if len(chain) > len(aliases):
+                raise ValueError(f"Tham chiếu vòng tại node '{node_id}'")
+            chain.append(node_id)
+            node_id = aliases[node_id]
+        for ref_id in chain:
+            aliases[ref_id] = node_id
+        return node_id
+
+    def reload_pnml(self, file_path):
+        """
+        Đọc lại file PNML đã sửa và so sánh cấu trúc với net đang có.
+        Artifact dẫn xuất của phần không đổi (quan hệ BDD của từng transition) được giữ lại,
+        nên lần phân tích kế tiếp chỉ tốn công cho phần đã sửa.
+
+        Returns:
+            Dict diff gồm các danh sách id: added/removed/changed_places (đổi initial marking
+            hoặc tên) và added/removed/changed_transitions (đổi pre/post hoặc trọng số arc),
+            hoặc None nếu đọc file lỗi.
+        """
+        new_net = PetriNet()
+        try:
+            new_net._parse_pnml(file_path)
         except Exception as e:
             print(f"Lỗi đọc file: {e}")
+            return None
+
+        diff = {
+            "added_places": [p for p in new_net.places if p not in self.places],
+            "removed_places": [p for p in self.places if p not in new_net.places],
+            "changed_places": [
+                p_id for p_id, p in new_net.places.items()
+                if p_id in self.places
+                and (p.initial_marking, p.name) != (self.places[p_id].initial_marking, self.places[p_id].name)
+            ],
+            "added_transitions": [t for t in new_net.transitions if t not in self.transitions],
+            "removed_transitions": [t for t in self.transitions if t not in new_net.transitions],
+            "changed_transitions": [
+                t_id for t_id in new_net.transitions
+                if t_id in self.transitions
+                and (new_net.pre_weight[t_id], new_net.post_weight[t_id]) != (self.pre_weight[t_id], self.post_weight[t_id])
+            ],
+        }
+
+        # Bỏ quan hệ BDD của transition bị xóa/sửa; nếu tập place đổi thì run_reachability_bdd tự dựng lại toàn bộ
+        for t_id in diff["removed_transitions"] + diff["changed_transitions"]:
+            self._bdd_relations.pop(t_id, None)
+
+        self.places = new_net.places
+        self.transitions = new_net.transitions
+        self.arcs = new_net.arcs
+        self.pre_set = new_net.pre_set
+        self.post_set = new_net.post_set
+        self.pre_weight = new_net.pre_weight
+        self.post_weight = new_net.post_weight
+        # Chỉ số nguyên có thể dịch chuyển khi thêm/xóa node; dựng lại CompiledNet chỉ tốn O(|net|)
+        self._invalidate_structure()
+
+        print(f"ĐỌC LẠI FILE: places +{len(diff['added_places'])} -{len(diff['removed_places'])} "
+              f"~{len(diff['changed_places'])}, transitions +{len(diff['added_transitions'])} "
+              f"-{len(diff['removed_transitions'])} ~{len(diff['changed_transitions'])}.")
+        return diff
+
+    # --- CACHE NHỊ PHÂN ---
+
+    @staticmethod
+    def _file_digest(file_path):
+        h = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.digest()
+
+    def _encode_compact(self, digest=bytes(32)):
+        """
+        Mã hóa net thành dạng nhị phân gọn: bảng id/name, initial marking và
+        pre/post dạng CSR (mảng offset + mảng chỉ số place + mảng trọng số). Trả về None nếu net
+        có arc không biểu diễn được (đầu mút không tồn tại, arc place -> place...).
+        """
+        place_ids = list(self.places)
+        trans_ids = list(self.transitions)
+        place_index = {p_id: i for i, p_id in enumerate(place_ids)}
+
+        pre_ptr, pre_idx, pre_w = array('I', [0]), array('I'), array('I')
+        post_ptr, post_idx, post_w = array('I', [0]), array('I'), array('I')
+        for t_id in trans_ids:
+            for p_id in self.pre_set[t_id]:
+                if p_id not in place_index:
+                    return None
+                pre_idx.append(place_index[p_id])
+                pre_w.append(self.pre_weight[t_id][p_id])
+            for p_id in self.post_set[t_id]:
+                if p_id not in place_index:
+                    return None
+                post_idx.append(place_index[p_id])
+                post_w.append(self.post_weight[t_id][p_id])
+            pre_ptr.append(len(pre_idx))
+            post_ptr.append(len(post_idx))
+        if len(pre_idx) + len(post_idx) != len(self.arcs):
+            return None
+
+        names = [p.name for p in self.places.values()]
+        strings = "\0".join(place_ids + names + trans_ids).encode("utf-8")
+        markings = array('q', (p.initial_marking for p in self.places.values()))
+        return b"".join([
+            _CACHE_HEADER.pack(_CACHE_MAGIC, digest, len(place_ids), len(trans_ids), len(strings)),
+            strings,
+            markings.tobytes(),
+            pre_ptr.tobytes(), struct.pack("<I", len(pre_idx)), pre_idx.tobytes(), pre_w.tobytes(),
+            post_ptr.tobytes(), struct.pack("<I", len(post_idx)), post_idx.tobytes(), post_w.tobytes(),
+        ])
+
+    def _decode_compact(self, data, digest=None):
+        """Nạp net từ dạng nhị phân của _encode_compact. Trả về False nếu sai định dạng hoặc lệch digest."""
+        if len(data) < _CACHE_HEADER.size:
+            return False
+        magic, cached_digest, n_places, n_trans, n_strings = _CACHE_HEADER.unpack_from(data)
+        if magic != _CACHE_MAGIC or (digest is not None and cached_digest != digest):
             return False
+        pos = _CACHE_HEADER.size
+
+        def take(typecode, count):
+            nonlocal pos
+            arr = array(typecode)
+            end = pos + count * arr.itemsize
+            if end > len(data):
+                raise ValueError("dữ liệu nhị phân bị cắt cụt")
+            arr.frombytes(data[pos:end])
+            pos = end
+            return arr
+
+        def take_count():
+            nonlocal pos
+            (count,) = struct.unpack_from("<I", data, pos)
+            pos += 4
+            return count
+
+        def check_csr(ptr, idx, count):
+            # Offset phải bắt đầu từ 0, không giảm, kết thúc đúng số phần tử; chỉ số place hợp lệ
+            if ptr[0] != 0 or ptr[-1] != count or any(a > b for a, b in zip(ptr, ptr[1:])):
+                raise ValueError("offset pre/post không hợp lệ")
+            if idx and max(idx) >= n_places:
+                raise ValueError("chỉ số place vượt phạm vi")
+
+        if pos + n_strings > len(data):
+            raise ValueError("dữ liệu nhị phân bị cắt cụt")
+        strings = data[pos:pos + n_strings].decode("utf-8").split("\0") if 2 * n_places + n_trans else []
+        pos += n_strings
+        if len(strings) != 2 * n_places + n_trans:
+            raise ValueError("bảng chuỗi không khớp số place/transition")
+        place_ids = strings[:n_places]
+        names = strings[n_places:2 * n_places]
+        trans_ids = strings[2 * n_places:]
+        markings = take('q', n_places)
+        pre_ptr = take('I', n_trans + 1)
+        n_pre = take_count()
+        pre_idx, pre_w = take('I', n_pre), take('I', n_pre)
+        post_ptr = take('I', n_trans + 1)
+        n_post = take_count()
+        post_idx, post_w = take('I', n_post), take('I', n_post)
+        if pos != len(data):
+            raise ValueError("dữ liệu thừa sau phần net")
+        check_csr(pre_ptr, pre_idx, n_pre)
+        check_csr(post_ptr, post_idx, n_post)
+
+        # Dựng toàn bộ net vào biến cục bộ, chỉ ghi vào self khi đã giải mã xong,
+        # để dữ liệu hỏng không bao giờ để lại một net dở dang
+        places = {}
+        for p_id, name, init_marking in zip(place_ids, names, markings):
+            new_place = Place(p_id, init_marking)
+            new_place.name = name
+            places[p_id] = new_place
+        transitions, pre_set, post_set, pre_weight, post_weight, arcs = {}, {}, {}, {}, {}, []
+        for k, t_id in enumerate(trans_ids):
+            transitions[t_id] = Transition(t_id)
+            pre = range(pre_ptr[k], pre_ptr[k + 1])
+            post = range(post_ptr[k], post_ptr[k + 1])
+            pre_set[t_id] = [place_ids[pre_idx[j]] for j in pre]
+            post_set[t_id] = [place_ids[post_idx[j]] for j in post]
+            pre_weight[t_id] = {place_ids[pre_idx[j]]: pre_w[j] for j in pre}
+            post_weight[t_id] = {place_ids[post_idx[j]]: post_w[j] for j in post}
+            arcs.extend(Arc(place_ids[pre_idx[j]], t_id, pre_w[j]) for j in pre)
+            arcs.extend(Arc(t_id, place_ids[post_idx[j]], post_w[j]) for j in post)
+
+        self.places.update(places)
+        self.transitions.update(transitions)
+        self.pre_set.update(pre_set)
+        self.post_set.update(post_set)
+        self.pre_weight.update(pre_weight)
+        self.post_weight.update(post_weight)
+        self.arcs.extend(arcs)
+        self._invalidate_structure()
+        return True
+
+    def _load_cache(self, cache_path, digest):
+        if not os.path.exists(cache_path):
+            return False
+        with open(cache_path, "rb") as f:
+            data = f.read()
+        try:
+            return self._decode_compact(data, digest)
+        except (ValueError, IndexError, struct.error, UnicodeDecodeError):
+            return False # Cache hỏng -> đọc lại từ XML
+
+    def _save_cache(self, cache_path, digest):
+        data = self._encode_compact(digest)
+        if data is None:
+            return False
+        try:
+            # Ghi ra file tạm rồi đổi tên để không bao giờ để lại cache ghi dở
+            tmp_path = cache_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+            return True
+        except OSError:
+            return False
+
+    def _link_arc(self, source, target, weight=1):
+        # Map input/output cho dễ truy xuất khi chạy thuật toán.
+        # Nhiều arc giữa cùng một cặp node được gộp lại bằng cách cộng trọng số.
+        if target in self.transitions: # Arc: Place -> Transition (Input)
+            weights = self.pre_weight[target]
+            if source not in weights:
+                self.pre_set[target].append(source)
+            weights[source] = weights.get(source, 0) + weight
+        elif source in self.transitions: # Arc: Transition -> Place (Output)
+            weights = self.post_weight[source]
+            if target not in weights:
+                self.post_set[source].append(target)
+            weights[target] = weights.get(target, 0) + weight
 
     # --- PHẦN LOGIC CỦA TASK 2 ---
 
     def get_current_marking_tuple(self, marking_dict):
         # Chuyển trạng thái về dạng Tuple (0, 1, 0...) để lưu vào set (hashable)
-        # Sắp xếp theo ID để đảm bảo thứ tự nhất quán
-        sorted_ids = sorted(self.places.keys())
-        return tuple(marking_dict[pid] for pid in sorted_ids)
+        # theo thứ tự place canonical của CompiledNet (đã sort sẵn một lần)
+        return tuple(marking_dict[pid] for pid in self.compile().place_ids)
 
     def get_enabled_transitions(self, current_marking):
         enabled = []
         for t_id in self.transitions:
-            # Một transition enable nếu TẤT CẢ nơi đầu vào đều có token > 0
+            # Một transition enable nếu TẤT CẢ nơi đầu vào đều có đủ token (>= trọng số arc)
             is_enabled = True
+            weights = self.pre_weight[t_id]
             for p_in in self.pre_set[t_id]:
-                if current_marking[p_in] < 1:
+                if current_marking[p_in] < weights[p_in]:
                     is_enabled = False
                     break
             if is_enabled:
@@ -111,94 +1143,616 @@ class PetriNet:
         new_marking = current_marking.copy()
         
         # 1. Trừ token ở đầu vào
-        for p_in in self.pre_set[t_id]:
-            new_marking[p_in] -= 1
+        for p_in, w in self.pre_weight[t_id].items():
+            new_marking[p_in] -= w
             
         # 2. Cộng token ở đầu ra
-        for p_out in self.post_set[t_id]:
-            new_marking[p_out] += 1
+        for p_out, w in self.post_weight[t_id].items():
+            new_marking[p_out] += w
             
         return new_marking
 
-    def run_reachability_bfs(self):
+    def run_reachability_bfs(self, codegen=False, store="exact"):
+        """
+        BFS tường minh trên mọi net P/T. codegen=True: dùng hàm successors sinh riêng cho net
+        (xem codegen.py) thay cho vòng lặp diễn giải pre/delta; kết quả giống hệt.
+        Hàm sinh ra kiểm tra mọi transition ở mỗi marking (không dùng tập enable tăng dần),
+        nên có lợi với net vừa phải; net hàng nghìn transition nên giữ mặc định.
+        store="fingerprint": tập visited chỉ giữ fingerprint 64 bit của mỗi marking
+        (state_store.FingerprintStore, hash compaction) thay cho MarkingSet; tốn ít bộ nhớ hơn
+        nhiều, đổi lại có một xác suất rất nhỏ (được in ra) đếm thiếu do trùng fingerprint.
+        """
+        if store not in ("exact", "fingerprint"):
+            raise ValueError(f"store phải là 'exact' hoặc 'fingerprint', nhận {store!r}")
         print("\n--- BẮT ĐẦU DUYỆT TRẠNG THÁI (BFS) ---")
-        
-        # 1. Khởi tạo Marking ban đầu từ dữ liệu đã đọc
-        initial_marking = {pid: p.initial_marking for pid, p in self.places.items()}
-        
-        # Queue chứa các Marking cần duyệt
-        queue = deque([initial_marking])
-        
-        # Set chứa các Marking đã duyệt (dùng tuple để lưu trữ unique)
-        visited = set()
-        visited.add(self.get_current_marking_tuple(initial_marking))
-        
-        count = 0
+        # Marking lưu 1 byte/place; nếu có place vượt 255 token thì duyệt lại với kiểu rộng hơn
+        for typecode in MARKING_TYPECODES:
+            try:
+                visited = self._explore_markings(typecode, codegen, store)
+                break
+            except OverflowError:
+                if typecode == MARKING_TYPECODES[-1]:
+                    raise
+
+        print(f"Reachable Markings: {len(visited)}")
+        if store == "fingerprint":
+            print(f"Fingerprint table: {visited.memory_bytes()} bytes, "
+                  f"P(collision) <= {visited.collision_probability():.2e}")
+        #print("Danh sách các trạng thái:", visited)
+        return len(visited)
+
+    def _explore_markings(self, typecode, codegen=False, store="exact"):
+        # BFS trả về tập visited chứa mọi marking đạt được: MarkingSet (store="exact") hoặc
+        # FingerprintStore. Cả hai có add(data) -> True nếu marking mới, nên dùng chung một vòng lặp;
+        # queue chỉ giữ bytes của marking. Ném OverflowError nếu số token không vừa typecode.
+        net = self.compile()
+        pre, delta, affected = net.pre, net.delta, net.affected
+        if store == "fingerprint":
+            visited = _state_store.FingerprintStore()
+        else:
+            visited = MarkingSet()
+        is_new = visited.add
+
+        # 1. Khởi tạo marking ban đầu (theo thứ tự place canonical)
+        initial = array(typecode, net.initial).tobytes()
+        is_new(initial)
+
+        if codegen:
+            # Successor sinh bằng code chuyên biệt cho net (xem codegen.py)
+            successors = _codegen.successor_function(net, typecode)
+            queue = deque([initial])
+            while queue:
+                for data in successors(queue.popleft()):
+                    if is_new(data):
+                        queue.append(data)
+            return visited
+
+        # Queue chứa các (bytes marking, danh sách transition enable tại marking đó)
+        queue = deque([(initial, net.enabled_set(net.initial))])
+
+        while queue:
+            curr_data, enabled = queue.popleft()
+
+            for k in enabled:
+                # Bắn trực tiếp trên bản copy bytes của marking cha, không qua dict/tuple
+                next_m = array(typecode, curr_data)
+                for i, d in delta[k]:
+                    next_m[i] += d
+                data = next_m.tobytes()
+
+                if is_new(data):
+                    # Tập enable của marking con suy ra từ marking cha: chỉ kiểm tra lại
+                    # các transition đọc từ place vừa đổi số token
+                    recheck = affected[k]
+                    next_enabled = [u for u in enabled if u not in recheck]
+                    for u in recheck:
+                        for i, w in pre[u]:
+                            if next_m[i] < w:
+                                break
+                        else:
+                            next_enabled.append(u)
+                    queue.append((data, next_enabled))
+        return visited
+
+    def run_reachability_bitset(self):
+        """
+        BFS tường minh cho net 1-safe: mỗi marking là MỘT số nguyên Python, bit i = place thứ i
+        (thứ tự canonical). Enable: (m & pre) == pre; bắn: (m & ~pre) | post.
+        Cho cùng số trạng thái với run_reachability_bfs nhưng không phải tạo tuple/list cho mỗi lần bắn.
+        Ném ValueError nếu net không 1-safe (có lần bắn đặt token thứ 2 vào một place).
+        """
+        print("\n--- BẮT ĐẦU DUYỆT TRẠNG THÁI (BITSET) ---")
+        net = self.compile()
+        masks = net.bit_masks()
+        initial_bits = net.marking_to_bits(net.initial)
+
+        queue = deque([initial_bits])
+        visited = {initial_bits}
         while queue:
             curr_m = queue.popleft()
-            count += 1
-            
-            curr_tuple = self.get_current_marking_tuple(curr_m)
-            # print(f"Marking {count}: {curr_tuple}") # Uncomment nếu muốn in từng bước
+            for k, pre_mask, keep_mask, post_mask in masks:
+                if curr_m & pre_mask == pre_mask:
+                    rest = curr_m & keep_mask
+                    if rest & post_mask:
+                        raise ValueError(f"Net không 1-safe: bắn '{net.transition_ids[k]}' tạo place có 2 token")
+                    next_m = rest | post_mask
+                    if next_m not in visited:
+                        visited.add(next_m)
+                        queue.append(next_m)
 
-            # Tìm các transition bắn được từ trạng thái này
-            enabled_trans = self.get_enabled_transitions(curr_m)
-            
-            for t_id in enabled_trans:
-                next_m = self.fire_transition(curr_m, t_id)
-                next_tuple = self.get_current_marking_tuple(next_m)
-                
-                if next_tuple not in visited:
-                    visited.add(next_tuple)
-                    queue.append(next_m)
-        
         print(f"Reachable Markings: {len(visited)}")
-        #print("Danh sách các trạng thái:", visited)
         return len(visited)
+
+    def compute_place_bounds(self, bounds=None, default_bound=255):
+        """
+        Bound token cho từng place (theo thứ tự canonical).
+        bounds: None, một số nguyên cho mọi place, hoặc dict {place_id: bound} (place thiếu dùng mặc định).
+        Mặc định: nếu không transition nào làm tăng tổng số token thì tổng token ban đầu là bound
+        chặt cho mọi place; nếu không thì dùng default_bound.
+        """
+        net = self.compile()
+        if isinstance(bounds, int):
+            return [bounds] * net.num_places
+        conservative = all(
+            sum(w for _, w in net.post[k]) <= sum(w for _, w in net.pre[k])
+            for k in range(net.num_transitions)
+        )
+        fallback = max(sum(net.initial), 1) if conservative else default_bound
+        bounds = bounds or {}
+        return [bounds.get(p_id, fallback) for p_id in net.place_ids]
+
+    def run_reachability_packed(self, bounds=None):
+        """
+        BFS tường minh cho net k-bounded với marking đóng gói: mỗi place vài bit trong một số nguyên
+        (xem PackedLayout), bound lấy từ compute_place_bounds(bounds).
+        Ném OverflowError khi có marking vượt bound đã giả định.
+        """
+        print("\n--- BẮT ĐẦU DUYỆT TRẠNG THÁI (PACKED) ---")
+        net = self.compile()
+        layout = PackedLayout(net, self.compute_place_bounds(bounds))
+        guard = layout.guard_mask
+        pad = layout.limit_pad
+        transitions = layout.transitions
+
+        # Kiểm tra trên tuple chưa pack: giá trị vượt trường sẽ làm hỏng chính marking đã pack
+        over = [net.place_ids[i] for i, tokens in enumerate(net.initial) if tokens > layout.bounds[i]]
+        if over:
+            raise OverflowError(f"Initial marking vượt bound tại: {over}")
+        initial_m = layout.pack(net.initial)
+        queue = deque([initial_m])
+        visited = {initial_m}
+        while queue:
+            curr_m = queue.popleft()
+            guarded = curr_m | guard
+            for k, pre_packed, delta in transitions:
+                if (guarded - pre_packed) & guard == guard:
+                    next_m = curr_m + delta
+                    if (next_m | (next_m + pad)) & guard:
+                        raise OverflowError(
+                            f"Bắn '{net.transition_ids[k]}' vượt bound tại: {layout.violated_places(next_m)}"
+                        )
+                    if next_m not in visited:
+                        visited.add(next_m)
+                        queue.append(next_m)
+
+        print(f"Reachable Markings: {len(visited)}")
+        return len(visited)
+
+    def run_reachability_frontier(self, max_batch_elements=1 << 18):
+        """
+        BFS đồng bộ theo tầng, vector hóa bằng NumPy: cả frontier là một mảng 2 chiều
+        (mỗi hàng một marking, kiểu uint8; tự chuyển sang int16 nếu có place vượt 255 token).
+          - Enable: so sánh frontier[:, place của arc] >= trọng số arc cho mọi arc vào,
+            đếm số điều kiện đúng theo từng transition (theo cột Pre).
+          - Successor: hàng của marking cha + cột tương ứng của ma trận incidence C (dạng thưa).
+          - Khử trùng lặp hàng loạt: mỗi hàng được băm thành một khóa uint64, sort + so khóa kề nhau
+            trong tầng, searchsorted vào mảng visited đã sort. Hàng có cùng khóa luôn được so lại
+            từng phần tử; nếu gặp va chạm băm thật thì duyệt lại với khóa chính xác (bytes của hàng).
+        max_batch_elements giới hạn kích thước mảng trung gian (số hàng x số arc) của mỗi lô.
+        Ném ImportError nếu chưa cài numpy.
+        """
+        if np is None:
+            raise ImportError("Cần cài numpy để dùng BFS theo frontier (pip install numpy)")
+        print("\n--- BẮT ĐẦU DUYỆT TRẠNG THÁI (FRONTIER) ---")
+        count = None
+        for dtype in (np.uint8, np.int16):
+            for exact in (False, True):
+                try:
+                    count = self._explore_frontier(dtype, max_batch_elements, exact)
+                    break
+                except _HashCollision:
+                    continue
+                except OverflowError:
+                    if dtype is np.int16:
+                        raise
+                    break
+            if count is not None:
+                break
+        print(f"Reachable Markings: {count}")
+        return count
+
+    def _explore_frontier(self, dtype, max_batch_elements, exact):
+        # Trả về số marking đạt được. Ném OverflowError nếu số token không vừa dtype,
+        # _HashCollision nếu (exact=False) hai marking khác nhau có cùng khóa băm.
+        net = self.compile()
+        num_places, num_transitions = net.num_places, net.num_transitions
+        if num_places == 0:
+            return 1
+        limit = np.iinfo(dtype).max
+        matrices = net.incidence_matrices()
+
+        # Pre theo cột (CSC = CSR của Pre^T): arc vào của transition k là [pre_ptr[k], pre_ptr[k+1])
+        pre_t = matrices.pre.T
+        pre_ptr, arc_place, arc_weight = pre_t.indptr, pre_t.indices, pre_t.data
+        need = np.diff(pre_ptr)
+        guarded = np.nonzero(need)[0]     # transition có ít nhất một input place
+        starts = pre_ptr[guarded]
+        # C theo cột: thay đổi token khi bắn transition k. Cộng theo modulo của dtype
+        # (trừ không bao giờ âm vì transition đã enable), tràn <=> cộng số dương mà kết quả nhỏ đi
+        c_t = matrices.incidence.T
+        delta_ptr, delta_place, delta_value = c_t.indptr, c_t.indices, c_t.data
+        delta_len = np.diff(delta_ptr)
+        if len(delta_value) and max(-delta_value.min(), delta_value.max()) > limit:
+            raise OverflowError("Trọng số arc vượt kiểu lưu của frontier")
+        delta_wrapped = delta_value.astype(dtype)
+        delta_positive = delta_value > 0
+
+        # Mỗi hàng được đệm thêm cột 0 cho tròn bội số 8 byte, để xem thẳng như các word uint64
+        itemsize = np.dtype(dtype).itemsize
+        num_words = -(-num_places * itemsize // 8)
+        num_cols = num_words * 8 // itemsize
+        if exact:
+            row_key = np.dtype((np.void, num_words * 8))
+
+            def keys(rows):
+                return rows.view(row_key).ravel()
+        else:
+            # Khóa = tổng (mod 2^64) các word của hàng, mỗi word cộng muối theo vị trí
+            # rồi trộn bit bằng hàm hoàn thiện của splitmix64
+            salt = np.arange(num_words, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+            mul1, mul2 = np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB)
+            shift1, shift2, shift3 = np.uint64(30), np.uint64(27), np.uint64(31)
+
+            def keys(rows):
+                x = rows.view(np.uint64) + salt
+                x ^= x >> shift1
+                x *= mul1
+                x ^= x >> shift2
+                x *= mul2
+                x ^= x >> shift3
+                return x.sum(axis=1, dtype=np.uint64)
+
+        def dedupe(rows):
+            # -> (khóa đã sort không trùng, hàng tương ứng)
+            row_keys = keys(rows)
+            order = np.argsort(row_keys)
+            row_keys = row_keys[order]
+            same = row_keys[1:] == row_keys[:-1]
+            if not exact:
+                # Chỉ so lại các cặp hàng kề nhau có cùng khóa
+                dup = np.nonzero(same)[0]
+                words = rows.view(np.uint64)
+                if (words[order[dup]] != words[order[dup + 1]]).any():
+                    raise _HashCollision()
+            first = np.concatenate(([True], ~same))
+            return row_keys[first], rows[order[first]]
+
+        batch_rows = max(1, max_batch_elements // max(len(arc_place), num_cols, 1))
+        if max(net.initial) > limit:
+            raise OverflowError("Initial marking vượt kiểu lưu")
+        frontier = np.zeros((1, num_cols), dtype=dtype)
+        frontier[0, :num_places] = net.initial
+        visited_keys, visited_rows = dedupe(frontier)
+
+        while len(frontier):
+            batches = []
+            for start in range(0, len(frontier), batch_rows):
+                block = frontier[start:start + batch_rows]
+                enabled = np.ones((len(block), num_transitions), dtype=bool)
+                if len(guarded):
+                    satisfied = (block[:, arc_place] >= arc_weight).view(np.uint8)
+                    enabled[:, guarded] = np.add.reduceat(satisfied, starts, axis=1) == need[guarded]
+                rows, trans = np.nonzero(enabled)
+                if not len(rows):
+                    continue
+
+                # successor = hàng cha + C[:, k]; các (hàng, place) của cùng một transition không trùng nhau
+                succ = block[rows]
+                counts = delta_len[trans]
+                total = int(counts.sum())
+                if total:
+                    ends = np.cumsum(counts)
+                    arc_pos = np.arange(total) + np.repeat(delta_ptr[trans] - (ends - counts), counts)
+                    cells = (np.repeat(np.arange(len(trans)), counts), delta_place[arc_pos])
+                    updated = succ[cells] + delta_wrapped[arc_pos]
+                    if (delta_positive[arc_pos] & (updated < delta_wrapped[arc_pos])).any():
+                        raise OverflowError("Số token vượt kiểu lưu của frontier")
+                    succ[cells] = updated
+                # Frontier nhiều lô thì khử trùng lặp từng lô trước để giới hạn bộ nhớ
+                batches.append(dedupe(succ)[1] if len(frontier) > batch_rows else succ)
+            if not batches:
+                break
+
+            cand_keys, cand_rows = dedupe(np.concatenate(batches) if len(batches) > 1 else batches[0])
+            pos = np.searchsorted(visited_keys, cand_keys)
+            match = np.minimum(pos, len(visited_keys) - 1)
+            seen = visited_keys[match] == cand_keys
+            if not exact and (visited_rows[match[seen]].view(np.uint64) != cand_rows[seen].view(np.uint64)).any():
+                raise _HashCollision()
+            fresh = ~seen
+            visited_keys = np.insert(visited_keys, pos[fresh], cand_keys[fresh])
+            visited_rows = np.insert(visited_rows, pos[fresh], cand_rows[fresh], axis=0)
+            frontier = cand_rows[fresh]
+        return len(visited_keys)
+
+    def run_reachability_parallel(self, num_workers=None, batch_size=1024):
+        """
+        BFS tường minh song song trên nhiều process, chia không gian trạng thái theo băm:
+        marking m thuộc worker crc32(m) % num_workers, chỉ worker đó lưu và bắn m.
+        Successor thuộc worker khác được gom thành lô batch_size marking rồi gửi qua queue.
+        Các worker chạy đồng bộ theo tầng: mỗi worker gửi dấu kết thúc tầng cho mọi worker khác,
+        nên khi tiến trình điều phối thấy cả tầng không sinh marking mới nào là đã duyệt xong.
+        Cho cùng số trạng thái với run_reachability_bfs.
+        """
+        print("\n--- BẮT ĐẦU DUYỆT TRẠNG THÁI (PARALLEL) ---")
+        num_workers = num_workers or os.cpu_count() or 1
+        for typecode in MARKING_TYPECODES:
+            try:
+                count = self._explore_partitioned(typecode, num_workers, batch_size)
+                break
+            except OverflowError:
+                if typecode == MARKING_TYPECODES[-1]:
+                    raise
+        print(f"Reachable Markings: {count} ({num_workers} worker)")
+        return count
+
+    def _explore_partitioned(self, typecode, num_workers, batch_size):
+        net = self.compile()
+        initial = array(typecode, net.initial).tobytes()
+        ctx = multiprocessing.get_context()
+        inboxes = [ctx.Queue() for _ in range(num_workers)]
+        commands = [ctx.Queue() for _ in range(num_workers)]
+        results = ctx.Queue()
+        owner = zlib.crc32(initial) % num_workers
+        workers = [
+            ctx.Process(
+                target=_partition_worker,
+                args=(wid, num_workers, net.pre, net.delta, typecode, initial if wid == owner else None,
+                      batch_size, inboxes, commands[wid], results),
+                daemon=True,
+            )
+            for wid in range(num_workers)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            while True:
+                for command in commands:
+                    command.put("expand")
+                if sum(self._collect_partition_results(results, workers)) == 0:
+                    break
+            for command in commands:
+                command.put("stop")
+            total = sum(self._collect_partition_results(results, workers))
+            for worker in workers:
+                worker.join()
+            return total
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+
+    @staticmethod
+    def _collect_partition_results(results, workers, poll_seconds=1.0):
+        # Nhận đúng một kết quả (wid, status, value) từ mỗi worker, trả về list các value.
+        # Không chờ vô hạn: worker chết mà không gửi kết quả (OOM killer, tín hiệu...) thì
+        # các worker khác cũng treo ở inbox.get(), nên phải phát hiện ở đây và ném lỗi.
+        values = {}
+        suspects = set()
+        while len(values) < len(workers):
+            try:
+                wid, status, value = results.get(timeout=poll_seconds)
+            except queue.Empty:
+                dead = {wid for wid, worker in enumerate(workers)
+                        if wid not in values and not worker.is_alive()}
+                # Kết quả gửi ngay trước khi thoát có thể còn trên đường ống: chỉ kết luận
+                # worker đã chết khi nó vẫn im lặng sau thêm một chu kỳ chờ
+                lost = dead & suspects
+                if lost:
+                    wid = min(lost)
+                    raise RuntimeError(f"Worker {wid} dừng bất thường (exitcode {workers[wid].exitcode})")
+                suspects = dead
+                continue
+            if status == "overflow":
+                raise OverflowError(value)
+            if status == "error":
+                raise RuntimeError(f"Worker {wid} lỗi:\n{value}")
+            values[wid] = value
+        return list(values.values())
+
+    def run_reachability_external(self, memory_budget=256 << 20, work_dir=None):
+        """
+        BFS ngoài bộ nhớ với khử trùng lặp trễ (delayed duplicate detection), cho không gian
+        trạng thái lớn hơn RAM. Mỗi tầng BFS và tập visited là file bản ghi đã sort trên đĩa:
+          1. Successor của tầng hiện tại được gom vào bộ đệm (khoảng memory_budget / 2 byte),
+             đầy thì sort rồi ghi thành file run.
+          2. Merge các run (khử trùng) và trừ đi file visited bằng một lượt merge tuần tự -> tầng mới.
+          3. visited mới = merge(visited, tầng mới).
+        Không có tra cứu ngẫu nhiên nên bộ nhớ bị chặn bởi memory_budget, còn đĩa tốn khoảng
+        2 lần (số marking x số byte một marking). File tạm nằm trong work_dir (mặc định thư mục tạm
+        của hệ thống) và bị xóa khi xong.
+        """
+        print("\n--- BẮT ĐẦU DUYỆT TRẠNG THÁI (EXTERNAL) ---")
+        for typecode in MARKING_TYPECODES:
+            try:
+                count = self._explore_external(typecode, memory_budget, work_dir)
+                break
+            except OverflowError:
+                if typecode == MARKING_TYPECODES[-1]:
+                    raise
+        print(f"Reachable Markings: {count}")
+        return count
+
+    def _explore_external(self, typecode, memory_budget, work_dir):
+        net = self.compile()
+        if net.num_places == 0:
+            return 1
+        record_size = net.num_places * array(typecode).itemsize
+        # 1/2 ngân sách cho bộ đệm successor, phần còn lại cho bộ đệm đọc của các file đang merge
+        chunk_records = max(1, memory_budget // 4 // (_external_store.MAX_FAN_IN + 2) // record_size)
+        # Bộ đệm ghi file cũng tính trong ngân sách: cùng cỡ với bộ đệm đọc của một file
+        buffer_bytes = chunk_records * record_size
+        transitions = list(zip(net.pre, net.delta))
+
+        tmp_dir = tempfile.mkdtemp(prefix="petrinet_bfs_", dir=work_dir)
+        try:
+            layer_path = os.path.join(tmp_dir, "layer_0")
+            visited_path = os.path.join(tmp_dir, "visited_0")
+            initial = array(typecode, net.initial).tobytes()
+            _external_store.write_records(layer_path, [initial])
+            _external_store.write_records(visited_path, [initial])
+            total = 1
+            depth = 0
+            while True:
+                depth += 1
+                spiller = _external_store.RunSpiller(
+                    tmp_dir, f"succ_{depth}", record_size, memory_budget // 2, buffer_bytes)
+                for data in _external_store.read_records(layer_path, record_size, chunk_records):
+                    curr_m = array(typecode, data)
+                    for pre_k, delta_k in transitions:
+                        for i, w in pre_k:
+                            if curr_m[i] < w:
+                                break
+                        else:
+                            next_m = array(typecode, data)
+                            for i, d in delta_k:
+                                next_m[i] += d
+                            spiller.add(next_m.tobytes())
+                runs = _external_store.reduce_runs(spiller.finish(), record_size, chunk_records)
+
+                # Tầng mới = (hợp các run) - visited, cả hai đều là dãy đã sort
+                os.remove(layer_path)
+                layer_path = os.path.join(tmp_dir, f"layer_{depth}")
+                fresh = _external_store.difference_sorted(
+                    _external_store.merge_sorted(runs, record_size, chunk_records),
+                    _external_store.read_records(visited_path, record_size, chunk_records),
+                )
+                count = _external_store.write_records(layer_path, fresh, buffer_bytes)
+                for path in runs:
+                    os.remove(path)
+                if count == 0:
+                    return total
+                total += count
+
+                new_visited_path = os.path.join(tmp_dir, f"visited_{depth}")
+                _external_store.write_records(
+                    new_visited_path,
+                    _external_store.merge_sorted([visited_path, layer_path], record_size, chunk_records),
+                    buffer_bytes)
+                os.remove(visited_path)
+                visited_path = new_visited_path
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def run_reachability_bitstate(self, num_bits=1 << 27, num_hashes=3, max_depth=None):
+        """
+        DFS tường minh với bitstate hashing (xem state_store.BitStateStore): bộ nhớ cố định
+        num_bits / 8 byte cho tập visited cộng với ngăn xếp DFS (giới hạn bởi max_depth nếu có).
+        Số trả về là cận dưới của số marking đạt được; ước lượng số marking bị bỏ sót được in ra.
+        """
+        print("\n--- BẮT ĐẦU DUYỆT TRẠNG THÁI (BITSTATE) ---")
+        store, _ = self._bitstate_search(num_bits, num_hashes, max_depth, stop_at_deadlock=False)
+        print(f"Reachable Markings (tối thiểu): {len(store)}")
+        print(f"--> Bit array: {store.memory_bytes()} bytes, đã bật {store.fill_ratio():.2%}, "
+              f"ước lượng bỏ sót ~{store.expected_missed:.2f} marking")
+        return len(store)
+
+    def check_deadlock_bitstate(self, num_bits=1 << 27, num_hashes=3, max_depth=None):
+        """
+        Tìm deadlock bằng DFS bitstate, dừng ở deadlock đầu tiên gặp được.
+        Trả về tuple marking của deadlock (thứ tự place canonical, như check_deadlock_bdd) và in
+        dãy transition dẫn tới nó; trả về None nếu không gặp deadlock nào. Vì bitstate có thể bỏ
+        sót trạng thái, None không chứng minh net không có deadlock.
+        """
+        store, witness = self._bitstate_search(num_bits, num_hashes, max_depth, stop_at_deadlock=True)
+        if witness is None:
+            print(f"Không gặp deadlock ({len(store)} marking, ước lượng bỏ sót ~{store.expected_missed:.2f})")
+            return None
+        marking, trace = witness
+        print(f"Deadlock sau {len(trace)} bước: {' -> '.join(trace) or '(marking ban đầu)'}")
+        return marking
+
+    def _bitstate_search(self, num_bits, num_hashes, max_depth, stop_at_deadlock):
+        for typecode in MARKING_TYPECODES:
+            try:
+                store = _state_store.BitStateStore(num_bits, num_hashes)
+                return store, self._bitstate_dfs(typecode, store, max_depth, stop_at_deadlock)
+            except OverflowError:
+                if typecode == MARKING_TYPECODES[-1]:
+                    raise
+
+    def _bitstate_dfs(self, typecode, store, max_depth, stop_at_deadlock):
+        # DFS lặp trên ngăn xếp các khung [bytes, array, transition kế tiếp cần thử, đã có transition enable].
+        # fired[i] là transition đi từ khung i sang khung i + 1, nên ngăn xếp chính là đường đi từ M0.
+        # Trả về (tuple marking, [id transition]) của deadlock đầu tiên nếu stop_at_deadlock, ngược lại None.
+        net = self.compile()
+        pre, delta, num_transitions = net.pre, net.delta, net.num_transitions
+        initial = array(typecode, net.initial)
+        store.add(initial.tobytes())
+        stack = [[initial.tobytes(), initial, 0, False]]
+        fired = []
+        while stack:
+            frame = stack[-1]
+            data, curr_m = frame[0], frame[1]
+            for k in range(frame[2], num_transitions):
+                for i, w in pre[k]:
+                    if curr_m[i] < w:
+                        break
+                else:
+                    frame[3] = True
+                    if max_depth is not None and len(stack) > max_depth:
+                        continue
+                    next_m = array(typecode, data)
+                    for i, d in delta[k]:
+                        next_m[i] += d
+                    next_data = next_m.tobytes()
+                    if store.add(next_data):
+                        frame[2] = k + 1
+                        stack.append([next_data, next_m, 0, False])
+                        fired.append(k)
+                        break
+            else:
+                # Đã thử hết transition của khung này
+                if stop_at_deadlock and not frame[3]:
+                    return tuple(curr_m), [net.transition_ids[k] for k in fired]
+                stack.pop()
+                if fired:
+                    fired.pop()
+        return None
+
     # --- KẾT THÚC PHẦN LOGIC CỦA TASK 2 ---
 
 
     
     def run_reachability_bdd(self):
-        # chỗ này gọi trình quản lí BDD nha
-        bdd = _bdd.BDD()
+        net = self.compile()
+        sorted_places = net.place_ids
+        if self._bdd is None or self._bdd_places != sorted_places:
+            # chỗ này gọi trình quản lí BDD nha
+            # Tập place đổi -> biến BDD và frame của mọi transition đổi theo, phải dựng lại hết
+            self.release_bdd()
+            self._bdd = _bdd.BDD()
+            self._bdd_places = sorted_places
+            for p_id in sorted_places:
+                self._bdd.declare(f"{p_id}", f"{p_id}_prime")
+        bdd = self._bdd
 
-        sorted_places = sorted(self.places.keys(), key=self.natural_keys)
         bdd_vars_curr = []
         rename_map = {} 
         for p_id in sorted_places:
-            var_curr = f"{p_id}"
-            var_next = f"{p_id}_prime"
-            bdd.declare(var_curr, var_next)
-            bdd_vars_curr.append(var_curr)
-            rename_map[var_next] = var_curr
+            bdd_vars_curr.append(f"{p_id}")
+            rename_map[f"{p_id}_prime"] = f"{p_id}"
 
         init_parts = []
-        for p_id in sorted_places:
-            if self.places[p_id].initial_marking > 0:
+        for p_id, init_marking in zip(sorted_places, net.initial):
+            if init_marking > 0:
                 init_parts.append(f"{p_id}")
             else:
                 init_parts.append(f"~ {p_id}")
         current_bdd = bdd.add_expr(" & ".join(init_parts))
         tr_list = []   
-        for t_id in self.transitions:
-            pre = bdd.true
-            for p in self.pre_set[t_id]: pre &= bdd.var(p)
-            post = bdd.true
-            pre_nodes = set(self.pre_set[t_id])
-            post_nodes = set(self.post_set[t_id])
-            for p in pre_nodes:
-                if p not in post_nodes: post &= ~bdd.var(f"{p}_prime")
-            for p in post_nodes: post &= bdd.var(f"{p}_prime")
-            frame = bdd.true
-            affected = pre_nodes | post_nodes
-            for p in sorted_places:
-                if p not in affected:
-                    p_c = bdd.var(p)
-                    p_n = bdd.var(f"{p}_prime")
-                    frame &= ((p_c & p_n) | (~p_c & ~p_n))
-            tr_item = pre & post & frame
-            tr_list.append(tr_item)
+        for k, t_id in enumerate(net.transition_ids):
+            # Quan hệ của transition chỉ phụ thuộc pre/post của nó (tập place đã cố định ở trên),
+            # nên transition không đổi thì dùng lại quan hệ đã dựng từ lần chạy trước
+            signature = (net.pre[k], net.post[k])
+            cached = self._bdd_relations.get(t_id)
+            if cached is not None and cached[0] == signature:
+                tr_item = cached[1]
+            else:
+                tr_item = self._build_transition_relation(bdd, net, k)
+                self._bdd_relations[t_id] = (signature, tr_item)
+            if tr_item is not None:
+                tr_list.append(tr_item)
         
         visited_bdd = current_bdd
         step = 0
@@ -309,26 +1863,53 @@ class PetriNet:
         #     print(f"Lỗi vẽ hình: {e}")
         # return num_states, visited_bdd, bdd
 
+    def _build_transition_relation(self, bdd, net, k):
+        # Mã hóa 1-safe: mỗi place chỉ có 0/1 token
+        pre_w = dict(net.pre[k])
+        post_w = dict(net.post[k])
+        if any(w > 1 for w in pre_w.values()):
+            return None # cần >= 2 token ở một input -> không bao giờ enable
+        if any(w > 1 for w in post_w.values()):
+            raise ValueError(f"Transition '{net.transition_ids[k]}' thêm nhiều hơn 1 token vào một place, không mã hóa 1-safe được")
+        names = net.place_ids
+        pre = bdd.true
+        for i in pre_w: pre &= bdd.var(names[i])
+        post = bdd.true
+        for i in pre_w:
+            if i not in post_w: post &= ~bdd.var(f"{names[i]}_prime")
+        for i in post_w: post &= bdd.var(f"{names[i]}_prime")
+        frame = bdd.true
+        for i in range(net.num_places):
+            if i not in pre_w and i not in post_w:
+                p_c = bdd.var(names[i])
+                p_n = bdd.var(f"{names[i]}_prime")
+                frame &= ((p_c & p_n) | (~p_c & ~p_n))
+        return pre & post & frame
+
     # ======================================== PHẦN LOGIC CỦA TASK 4 (MỚI) ========================================================
     def check_deadlock_bdd(self, bdd, visited_bdd):
         """
         Task 4: Deadlock detection using Symbolic Logic.
         Deadlock = (Reachable States) AND (States where NO transition is enabled).
         """
-        # 1. Khởi tạo danh sách các places đã sort để dùng cho care_vars và format output
-        sorted_places = sorted(self.places.keys(), key=self.natural_keys)
+        # 1. Danh sách các places theo thứ tự canonical để dùng cho care_vars và format output
+        net = self.compile()
+        sorted_places = net.place_ids
         
         # 2. Xây dựng biểu thức logic cho "Tất cả transitions bị disabled"
         all_transitions_disabled_expr = bdd.true
 
-        for t_id in self.transitions:
+        for input_places in net.pre:
 
             t_is_enabled = bdd.true
-            input_places = self.pre_set[t_id]
             
-            for p_id in input_places:
+            for i, w in input_places:
 
-                bdd_var_p = bdd.var(p_id)
+                if w > 1:
+                    # Place 1-safe không bao giờ có đủ token -> transition luôn disabled
+                    t_is_enabled = bdd.false
+                    break
+                bdd_var_p = bdd.var(sorted_places[i])
                 t_is_enabled = t_is_enabled & bdd_var_p
 
             t_is_disabled = ~t_is_enabled
@@ -361,7 +1942,10 @@ class PetriNet:
         for t_id in self.transitions.items():
             dot.append(f'  "{t_id[0]}" [shape=box, label="{t_id[0]}", style=filled, fillcolor=lightblue];')
         for a in self.arcs:
-            dot.append(f'  "{a.source_id}" -> "{a.target_id}";')
+            if a.weight != 1:
+                dot.append(f'  "{a.source_id}" -> "{a.target_id}" [label="{a.weight}"];')
+            else:
+                dot.append(f'  "{a.source_id}" -> "{a.target_id}";')
         dot.append("}")
         print("\n".join(dot))
         print("-" * 50)
@@ -392,7 +1976,7 @@ class PetriNet:
             return None, None
         
         # sorted_places = sorted(self.places.keys())
-        sorted_places = sorted(self.places.keys(), key=self.natural_keys)
+        sorted_places = self.compile().place_ids
         # kiểm tra có places không
         if not sorted_places:
             print("--> Lỗi: Không có places nào trong Petri net!")
@@ -475,15 +2059,17 @@ class PetriNet:
             # pick_iter trả về một "vòi nước" (generator), ta hứng từng giọt
             iterator = bdd.pick_iter(visited_bdd, care_vars=sorted_places)
             
+            # Chỉ những place có cost khác 0 mới ảnh hưởng tới c^T * M
+            weighted_places = [(p_id, cost_dict[p_id]) for p_id in sorted_places if cost_dict[p_id]]
             count = 0
             for state_model in iterator:
                 count += 1
                 current_val = 0
                 # Tính giá trị c^T * M cho trạng thái này
-                for p_id in sorted_places:
+                for p_id, cost in weighted_places:
                     # Nếu place có token (val=1) thì cộng cost
                     if state_model.get(p_id, False):
-                        current_val += cost_dict.get(p_id, 0)
+                        current_val += cost
                 
                 # Cập nhật Max ngay lập tức
                 if current_val > optimal_value:
@@ -500,3 +2086,149 @@ class PetriNet:
         if optimal_marking:
             return optimal_marking, optimal_value
         return None, None
+
+
+# ======================================== BFS SONG SONG ========================================================
+def _partition_worker(wid, num_workers, pre, delta, typecode, initial, batch_size, inboxes, commands, results):
+    # Process con của run_reachability_parallel: giữ phần visited của mình (marking m có
+    # crc32(m) % num_workers == wid), mỗi lệnh "expand" bắn hết frontier của một tầng.
+    visited = set()
+    frontier = []
+    if initial is not None:
+        visited.add(initial)
+        frontier.append(initial)
+    try:
+        _partition_loop(wid, num_workers, pre, delta, typecode, visited, frontier, batch_size,
+                        inboxes, commands, results)
+    except OverflowError as e:
+        results.put((wid, "overflow", str(e)))
+    except BaseException:
+        # Mọi lỗi khác (kể cả MemoryError) phải được báo về, nếu không tiến trình điều phối
+        # sẽ chờ mãi kết quả của worker này
+        results.put((wid, "error", traceback.format_exc()))
+
+def _partition_loop(wid, num_workers, pre, delta, typecode, visited, frontier, batch_size,
+                    inboxes, commands, results):
+    inbox = inboxes[wid]
+    transitions = list(zip(pre, delta))
+    while True:
+        if commands.get() == "stop":
+            results.put((wid, "done", len(visited)))
+            return
+        outgoing = [[] for _ in range(num_workers)]
+        next_frontier = []
+        for data in frontier:
+            curr_m = array(typecode, data)
+            for pre_k, delta_k in transitions:
+                for i, w in pre_k:
+                    if curr_m[i] < w:
+                        break
+                else:
+                    next_m = array(typecode, data)
+                    for i, d in delta_k:
+                        next_m[i] += d
+                    next_data = next_m.tobytes()
+                    target = zlib.crc32(next_data) % num_workers
+                    if target == wid:
+                        if next_data not in visited:
+                            visited.add(next_data)
+                            next_frontier.append(next_data)
+                    else:
+                        batch = outgoing[target]
+                        batch.append(next_data)
+                        if len(batch) >= batch_size:
+                            inboxes[target].put(batch)
+                            outgoing[target] = []
+        # Gửi nốt các lô còn dở và dấu kết thúc tầng (None) cho mọi worker khác
+        for target in range(num_workers):
+            if target != wid:
+                if outgoing[target]:
+                    inboxes[target].put(outgoing[target])
+                inboxes[target].put(None)
+        # Nhận successor từ các worker khác cho tới khi đủ num_workers - 1 dấu kết thúc
+        finished = 0
+        while finished < num_workers - 1:
+            batch = inbox.get()
+            if batch is None:
+                finished += 1
+                continue
+            for next_data in batch:
+                if next_data not in visited:
+                    visited.add(next_data)
+                    next_frontier.append(next_data)
+        frontier = next_frontier
+        results.put((wid, "level", len(frontier)))
+
+# ======================================== ĐỌC HÀNG LOẠT (BATCH) ========================================================
+PNML_SUFFIXES = (".pnml", ".pnml.gz", ".pnml.xz")
+
+def _load_pnml_worker(file_path, compiled=False):
+    # Chạy trong process con. Net được gửi về dạng nhị phân gọn (như file cache)
+    # vì pickle một chuỗi bytes rẻ hơn nhiều so với pickle hàng nghìn object Place/Arc.
+    net = PetriNet()
+    try:
+        net._parse_pnml(file_path)
+        if compiled:
+            return file_path, net.compile(), None
+    except Exception as e:
+        return file_path, None, f"{type(e).__name__}: {e}"
+    data = net._encode_compact()
+    return file_path, (data if data is not None else net), None
+
+def load_pnml_dir(dir_path, max_workers=None, compiled=False):
+    """
+    Đọc toàn bộ file PNML trong thư mục bằng một process pool.
+
+    Args:
+        dir_path: Thư mục chứa các file .pnml
+        max_workers: Số process (mặc định = số core). max_workers=1 đọc tuần tự trong process hiện tại.
+        compiled: True -> trả về CompiledNet (được dựng luôn trong process con) thay vì PetriNet
+
+    Returns:
+        (nets, errors):
+            - nets: Dict {tên file: PetriNet hoặc CompiledNet} của các file đọc thành công
+            - errors: Dict {tên file: thông báo lỗi} thay vì in lỗi ra màn hình
+    """
+    files = sorted(
+        os.path.join(dir_path, name) for name in os.listdir(dir_path)
+        if name.endswith(PNML_SUFFIXES) and os.path.isfile(os.path.join(dir_path, name))
+    )
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    if max_workers == 1 or len(files) <= 1:
+        results = [_load_pnml_worker(f, compiled) for f in files]
+    else:
+        # Gom nhiều file nhỏ vào một lần gửi để giảm chi phí IPC
+        chunksize = max(1, len(files) // (max_workers * 4))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_load_pnml_worker, files, [compiled] * len(files), chunksize=chunksize))
+
+    nets, errors = {}, {}
+    for file_path, payload, error in results:
+        name = os.path.basename(file_path)
+        if error is not None:
+            errors[name] = error
+        elif isinstance(payload, (PetriNet, CompiledNet)):
+            nets[name] = payload
+        else:
+            net = PetriNet()
+            net._decode_compact(payload)
+            nets[name] = net
+    return nets, errors
+
+def group_isomorphic(nets):
+    """
+    Gom các net giống nhau về cấu trúc (chỉ khác tên/thứ tự phần tử) để chỉ phân tích mỗi nhóm một lần.
+
+    Args:
+        nets: Dict {tên: PetriNet hoặc CompiledNet}, ví dụ kết quả của load_pnml_dir
+
+    Returns:
+        Dict {fingerprint: [tên, ...]} theo thứ tự tên xuất hiện trong nets
+    """
+    groups = {}
+    for name, net in nets.items():
+        key = net.fingerprint() if isinstance(net, PetriNet) else wl_fingerprint(net)
+        groups.setdefault(key, []).append(name)
+    return groups
@@ -0,0 +1,164 @@
+import ast
+import json
+import mmap
+import os
+import struct
+from array import array
+
+# Xuất cấu trúc net ra các mảng phẳng dạng .npy (định dạng NumPy v1.0, ghi bằng thư viện chuẩn).
+# Worker mở lại bằng mmap chỉ-đọc: N process dùng chung một bản vật lý trong page cache của OS,
+# không ai phải parse XML hay unpickle dict Place/Transition/Arc nữa.
+#
+# Nội dung thư mục xuất ra:
+#   initial.npy          int64[P]    initial marking theo thứ tự place canonical
+#   pre_ptr.npy          int32[T+1]  CSR: input places của transition k là pre_idx[pre_ptr[k]:pre_ptr[k+1]]
+#   pre_idx.npy          int32[...]
+#   pre_w.npy            int32[...]  trọng số arc tương ứng với pre_idx
+#   post_ptr.npy         int32[T+1]  CSR tương tự cho output places
+#   post_idx.npy         int32[...]
+#   post_w.npy           int32[...]
+#   place_ids.npy        S<w>[P]     bảng id place (bytes độ dài cố định, đệm \0)
+#   transition_ids.npy   S<w>[T]     bảng id transition
+#   meta.json            số place/transition
+
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+# typecode của array <-> descr của NumPy (little-endian)
+_DESCR = {'q': '<i8', 'i': '<i4'}
+_TYPECODE = {v: k for k, v in _DESCR.items()}
+
+def _write_npy_raw(path, descr, count, payload):
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (descr, count)
+    # Header được đệm để phần dữ liệu bắt đầu ở offset chia hết cho 64 (theo chuẩn .npy)
+    pad = -(len(_NPY_MAGIC) + 2 + len(header) + 1) % 64
+    header = (header + " " * pad + "\n").encode("latin1")
+    with open(path, "wb") as f:
+        f.write(_NPY_MAGIC)
+        f.write(struct.pack("<H", len(header)))
+        f.write(header)
+        f.write(payload)
+
+def write_npy(path, values):
+    """Ghi một array('q') hoặc array('i') ra file .npy một chiều."""
+    _write_npy_raw(path, _DESCR[values.typecode], len(values), values.tobytes())
+
+def write_npy_strings(path, strings):
+    """Ghi danh sách chuỗi ra .npy kiểu bytes độ dài cố định (S<w>)."""
+    encoded = [s.encode("utf-8") for s in strings]
+    width = max((len(b) for b in encoded), default=1) or 1
+    payload = b"".join(b.ljust(width, b"\0") for b in encoded)
+    _write_npy_raw(path, f"|S{width}", len(encoded), payload)
+
+def _open_npy(path):
+    # Trả về (descr, count, memoryview trỏ thẳng vào vùng mmap của phần dữ liệu)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"File rỗng: {path}")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(_NPY_MAGIC)] != _NPY_MAGIC:
+        raise ValueError(f"Không phải file .npy v1.0: {path}")
+    (header_len,) = struct.unpack_from("<H", mm, len(_NPY_MAGIC))
+    start = len(_NPY_MAGIC) + 2
+    header = ast.literal_eval(mm[start:start + header_len].decode("latin1"))
+    (count,) = header['shape']
+    return header['descr'], count, memoryview(mm)[start + header_len:]
+
+def open_npy(path):
+    """Mở file .npy số nguyên bằng mmap, trả về memoryview (không copy dữ liệu)."""
+    descr, count, view = _open_npy(path)
+    if descr not in _TYPECODE:
+        raise ValueError(f"Kiểu dữ liệu không hỗ trợ: {descr}")
+    typecode = _TYPECODE[descr]
+    return view[:count * array(typecode).itemsize].cast(typecode)
+
+class IdTable:
+    """Bảng id chỉ-đọc trên mmap: giải mã từng id khi được truy cập."""
+    def __init__(self, path):
+        descr, count, view = _open_npy(path)
+        self._width = int(descr[2:])
+        self._count = count
+        self._view = view
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        raw = bytes(self._view[i * self._width:(i + 1) * self._width])
+        return raw.rstrip(b"\0").decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(self._count))
+
+    def index_map(self):
+        # Dict id -> chỉ số, chỉ dựng khi thật sự cần tra ngược
+        return {name: i for i, name in enumerate(self)}
+
+class SharedNetArrays:
+    """Các mảng của net mở bằng mmap (xem export_shared_arrays)."""
+    def __init__(self, dir_path):
+        self.dir_path = dir_path
+        with open(os.path.join(dir_path, "meta.json")) as f:
+            meta = json.load(f)
+        self.num_places = meta["num_places"]
+        self.num_transitions = meta["num_transitions"]
+        self.initial = open_npy(os.path.join(dir_path, "initial.npy"))
+        self.pre_ptr = open_npy(os.path.join(dir_path, "pre_ptr.npy"))
+        self.pre_idx = open_npy(os.path.join(dir_path, "pre_idx.npy"))
+        self.post_ptr = open_npy(os.path.join(dir_path, "post_ptr.npy"))
+        self.post_idx = open_npy(os.path.join(dir_path, "post_idx.npy"))
+        self.pre_w = open_npy(os.path.join(dir_path, "pre_w.npy"))
+        self.post_w = open_npy(os.path.join(dir_path, "post_w.npy"))
+        self.place_ids = IdTable(os.path.join(dir_path, "place_ids.npy"))
+        self.transition_ids = IdTable(os.path.join(dir_path, "transition_ids.npy"))
+
+    def pre(self, k):
+        # Chỉ số các input place của transition thứ k
+        return self.pre_idx[self.pre_ptr[k]:self.pre_ptr[k + 1]]
+
+    def post(self, k):
+        # Chỉ số các output place của transition thứ k
+        return self.post_idx[self.post_ptr[k]:self.post_ptr[k + 1]]
+
+    def __repr__(self):
+        return f"SharedNetArrays({self.dir_path!r}, {self.num_places} places, {self.num_transitions} transitions)"
+
+def export_shared_arrays(net, dir_path):
+    """
+    Xuất cấu trúc của PetriNet ra thư mục dir_path dưới dạng các mảng .npy phẳng.
+    Place được sắp theo natural_keys (cùng thứ tự với engine BDD), transition theo thứ tự đọc.
+    """
+    os.makedirs(dir_path, exist_ok=True)
+    compiled = net.compile()
+    place_ids = compiled.place_ids
+    trans_ids = compiled.transition_ids
+
+    pre_ptr, pre_idx, pre_w = array('i', [0]), array('i'), array('i')
+    post_ptr, post_idx, post_w = array('i', [0]), array('i'), array('i')
+    for k in range(compiled.num_transitions):
+        for i, w in compiled.pre[k]:
+            pre_idx.append(i)
+            pre_w.append(w)
+        for i, w in compiled.post[k]:
+            post_idx.append(i)
+            post_w.append(w)
+        pre_ptr.append(len(pre_idx))
+        post_ptr.append(len(post_idx))
+
+    write_npy(os.path.join(dir_path, "initial.npy"), array('q', compiled.initial))
+    write_npy(os.path.join(dir_path, "pre_ptr.npy"), pre_ptr)
+    write_npy(os.path.join(dir_path, "pre_idx.npy"), pre_idx)
+    write_npy(os.path.join(dir_path, "post_ptr.npy"), post_ptr)
+    write_npy(os.path.join(dir_path, "post_idx.npy"), post_idx)
+    write_npy(os.path.join(dir_path, "pre_w.npy"), pre_w)
+    write_npy(os.path.join(dir_path, "post_w.npy"), post_w)
+    write_npy_strings(os.path.join(dir_path, "place_ids.npy"), place_ids)
+    write_npy_strings(os.path.join(dir_path, "transition_ids.npy"), trans_ids)
+    with open(os.path.join(dir_path, "meta.json"), "w") as f:
+        json.dump({"num_places": len(place_ids), "num_transitions": len(trans_ids)}, f)
+
+def open_shared_arrays(dir_path):
+    """Mở các mảng đã xuất bằng mmap chỉ-đọc; gọi được từ nhiều process cùng lúc."""
+    return SharedNetArrays(dir_path)
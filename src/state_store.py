@@ -0,0 +1,137 @@
+import hashlib
+import math
+from array import array
+
+# Các tập visited thay thế cho set() đầy đủ của các engine tường minh, đánh đổi độ chính xác
+# lấy bộ nhớ. Marking được đưa vào dưới dạng bytes (như phần tử của MarkingSet trong petrinet.py).
+
+class BitStateStore:
+    """
+    Bitstate hashing (supertrace): mỗi marking chỉ là num_hashes bit trong một mảng bit cấp phát
+    sẵn num_bits bit, nên bộ nhớ cố định bất kể số marking. Marking mới mà mọi bit của nó đã bật
+    (do các marking khác) bị coi là đã thăm -> có thể bỏ sót trạng thái, không bao giờ đếm dư.
+    """
+    def __init__(self, num_bits=1 << 27, num_hashes=3):
+        if num_bits <= 0 or num_hashes <= 0:
+            raise ValueError("num_bits và num_hashes phải dương")
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bytearray((num_bits + 7) // 8)
+        self.bits_set = 0
+        self.stored = 0
+        self.expected_missed = 0.0
+
+    def add(self, data):
+        """Đánh dấu marking; trả về True nếu nó được coi là mới (có ít nhất một bit chưa bật)."""
+        # Băm kép: bit thứ i = h1 + i * h2 (mod num_bits), h1/h2 lấy từ một digest 128 bit
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        bits = self.bits
+        is_new = False
+        for i in range(self.num_hashes):
+            pos = (h1 + i * h2) % self.num_bits
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                self.bits_set += 1
+                is_new = True
+        if is_new:
+            self.stored += 1
+            # Xác suất một marking mới khác bị nuốt ở độ đầy hiện tại là p; kỳ vọng số marking
+            # bị nuốt trước khi có thêm một marking được lưu là p / (1 - p)
+            p = self.omission_probability()
+            self.expected_missed += p / (1 - p) if p < 1 else float("inf")
+        return is_new
+
+    def omission_probability(self):
+        """Xác suất marking mới kế tiếp bị coi nhầm là đã thăm: (tỉ lệ bit đã bật) ^ num_hashes."""
+        return (self.bits_set / self.num_bits) ** self.num_hashes
+
+    def fill_ratio(self):
+        return self.bits_set / self.num_bits
+
+    def memory_bytes(self):
+        return len(self.bits)
+
+    def __len__(self):
+        return self.stored
+
+    def __repr__(self):
+        return (f"BitStateStore({self.stored} markings, {self.memory_bytes()} bytes, "
+                f"fill {self.fill_ratio():.4f}, ~{self.expected_missed:.1f} missed)")
+
+class FingerprintStore:
+    """
+    Hash compaction: chỉ lưu fingerprint 64 bit của mỗi marking trong một bảng địa chỉ mở
+    (dò tuyến tính) nằm trên một array('Q') phẳng, 11-23 byte/marking với hệ số tải 0.35-0.7.
+    Hai marking khác nhau trùng fingerprint sẽ bị coi là một (đếm thiếu), xác suất xem
+    collision_probability().
+    """
+    def __init__(self, capacity=1 << 16, max_load=0.7):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.max_load = max_load
+        self.table = array('Q', bytes(8 * size))
+        self.count = 0
+
+    @staticmethod
+    def fingerprint(data):
+        # 0 đánh dấu ô trống nên fingerprint 0 được đổi thành 1
+        return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little") or 1
+
+    def add(self, data):
+        """Thêm marking; trả về True nếu fingerprint của nó chưa có trong bảng."""
+        fp = self.fingerprint(data)
+        table = self.table
+        mask = len(table) - 1
+        i = fp & mask
+        while True:
+            slot = table[i]
+            if slot == 0:
+                table[i] = fp
+                self.count += 1
+                if self.count > len(table) * self.max_load:
+                    self._grow()
+                return True
+            if slot == fp:
+                return False
+            i = (i + 1) & mask
+
+    def __contains__(self, data):
+        fp = self.fingerprint(data)
+        table = self.table
+        mask = len(table) - 1
+        i = fp & mask
+        while table[i]:
+            if table[i] == fp:
+                return True
+            i = (i + 1) & mask
+        return False
+
+    def _grow(self):
+        old = self.table
+        table = self.table = array('Q', bytes(16 * len(old)))
+        mask = len(table) - 1
+        for fp in old:
+            if fp:
+                i = fp & mask
+                while table[i]:
+                    i = (i + 1) & mask
+                table[i] = fp
+
+    def collision_probability(self):
+        """Xác suất có ít nhất một cặp marking khác nhau trùng fingerprint: 1 - e^(-n(n-1)/2^65)."""
+        n = self.count
+        return -math.expm1(-n * (n - 1) / 2.0 ** 65) if n > 1 else 0.0
+
+    def memory_bytes(self):
+        return len(self.table) * self.table.itemsize
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return (f"FingerprintStore({self.count} markings, {self.memory_bytes()} bytes, "
+                f"P(collision) {self.collision_probability():.2e})")